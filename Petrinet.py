@@ -2,26 +2,91 @@ import random
 import graphviz
 from arc import In
 from arc import Out
+from place import Place
+from transition import Transition
+from genome import Genome
 class PetriNet():
-    def __init__(self, transitions, places):
+    def __init__(self, transitions=None, places=None, genome=None):
         """
         The petri net runner.
         :transitions: The transitions encoding the net.
+        :places: The places of the net.
+        :genome: Compact encoding of the net used instead of transitions and places,
+                 their objects are only built when something uses them.
         """
-        self.transitions = transitions
-        self.places = places
+        self._transitions = transitions
+        self._places = places
+        self._genome = genome
         self.fitness = 0
         self.accuracy = 0.01 # average accuracy from tokenreplay, not 0 becuase algorithm would divide by 0
         self.timesRun = 0 # times tokenreplay was run to calculate average accuracy
+        self.plan = None # replay plan built by compile, None when it has to be rebuilt
+        self.parents = () # nets this one was bred from, used by evaluateDelta
+        self.checkpoints = None # per trace the marking and token count before every event, see evaluateDelta
+        self.checkpointTraces = None
+        self.estimated = False # fitness is only an estimate from part of the log, see RacingEvaluator
+        self.transitionTable = None # memoized firings on bitmask markings, see evaluateBitmask
+        self.precision = 0 # share of the enabled transitions the log used, see evaluate with continuations
+        self.escapingEdges = 0
+        self.enabledEdges = 0
+
+    @property
+    def genome(self):
+        if self._genome is None:
+            self._genome = Genome.fromTransitions(self._transitions, self._places)
+        return self._genome
+
+    @property
+    def transitions(self):
+        if self._transitions is None:
+            self.buildObjects()
+        return self._transitions
+
+    @property
+    def places(self):
+        if self._places is None:
+            self.buildObjects()
+        return self._places
+
+    def buildObjects(self):
+        """
+        Builds the Place/Transition/Arc objects of the genome, e.g. for run or createGraph.
+        """
+        genome = self.genome
+        self._places = [Place(1 if i == 0 else 0, i + 1) for i in range(genome.placeCount)]
+        self._transitions = {}
+        for t, name in enumerate(genome.activities):
+            self._transitions[name] = Transition(name, [Out(self._places[p]) for p in genome.getOut(t)],
+                                                 [In(self._places[p]) for p in genome.getIn(t)])
+
+    def reuse(self, genome):
+        """
+        Turns this net into a new, unevaluated net of genome, e.g. to recycle a discarded net.
+        Returns the net.
+        """
+        self.__init__(genome=genome)
+        return self
+
+    def dropObjects(self):
+        """
+        Forgets everything derived from the genome, has to be called after the genome changed.
+        """
+        self._transitions = None
+        self._places = None
+        self.plan = None
+        self.checkpoints = None
+        self.checkpointTraces = None
+        self.transitionTable = None
     
-    def run(self, firing_sequence):
+    def run(self, firing_sequence, count=1):
         """
         Run the petri net.
         Details: This is a loop over the transactions firing and then some printing.
         :firing_sequence: Sequence of transition names use for run.
+        :count: How often the sequence occurs in the log, the run is weighted by it.
         :ps: Place holdings to print during the run (debugging).
         """
-        self.timesRun += 1
+        self.timesRun += count
         #print("Using firing sequence:\n" + " => ".join(firing_sequence))
         #print("start {}\n".format([p.holding for p in self.places]))
         
@@ -37,12 +102,361 @@ class PetriNet():
                         pass
                         #print(name, " didn't fire.")
                         #print("  =>  {}".format([p.holding for p in self.places]))
-        self.calcualteAccuracy()
-        
-        
+        self.calcualteAccuracy(count)
+
+    def compile(self):
+        """
+        Flattens the genome into a replay plan used by runCompiled.
+        Every activity maps to the transitions with that name, each given as tuples of
+        the place indices of its outgoing and ingoing arcs.
+        Has to be called again (or plan set to None) after the genome was changed.
+        """
+        genome = self.genome
+        self.plan = {}
+        self.planArcs = [] # tokens consumed and produced per firing of each transition
+        self.planOutArcs = [] # position of the first outgoing arc of each transition
+        outArcCount = 0
+        for t, name in enumerate(genome.activities):
+            outs = tuple(genome.getOut(t))
+            ins = tuple(genome.getIn(t))
+            self.plan[name] = self.plan.get(name, ()) + ((t, outs, ins, outArcCount),)
+            self.planArcs.append(len(outs) + len(ins))
+            self.planOutArcs.append(outArcCount)
+            outArcCount += len(outs)
+        self.outArcCount = outArcCount
+        self.planNeeds = None
+        return self.plan
+
+    def compileEnabling(self):
+        """
+        Adds what replayPrecision needs to the plan: the tokens every transition needs per place,
+        and the transitions whose enabling may change when a transition fires.
+        """
+        genome = self.genome
+        consumers = [[] for p in range(genome.placeCount)]
+        self.planNeeds = []
+        for t in range(len(genome.activities)):
+            needs = {}
+            for p in genome.getOut(t):
+                needs[p] = needs.get(p, 0) + 1
+            self.planNeeds.append(tuple(needs.items()))
+            for p in needs:
+                consumers[p].append(t)
+        self.planAffected = []
+        for t in range(len(genome.activities)):
+            affected = set()
+            for p in genome.getOut(t) + genome.getIn(t):
+                affected.update(consumers[p])
+            self.planAffected.append(tuple(sorted(affected)))
+        self.planIndex = {name: t for t, name in enumerate(genome.activities)}
+
+    def isEnabled(self, t, marking):
+        for p, tokens in self.planNeeds[t]:
+            if marking[p] < tokens:
+                return False
+        return True
+
+    def initialMarking(self):
+        marking = [0] * self.genome.placeCount
+        marking[0] = 1
+        return marking
+
+    def replayPlan(self, firing_sequence, marking, missing=None):
+        """
+        Replays the compiled plan on a list of place holdings, which is changed in place.
+        Returns how often every transition of the plan fired.
+        :missing: Optional list counting the missing tokens per outgoing arc.
+        """
+        if self.plan is None:
+            self.compile()
+        plan = self.plan
+        fired = [0] * len(self.planArcs)
+        for name in firing_sequence:
+            for k, outs, ins, firstOutArc in plan.get(name, ()):
+                if missing is not None:
+                    for j, p in enumerate(outs):
+                        if marking[p] < 1:
+                            missing[firstOutArc + j] += 1
+                for p in outs:
+                    marking[p] -= 1
+                for p in ins:
+                    marking[p] += 1
+                fired[k] += 1
+        return fired
+
+    def writeBackPlan(self, marking, fired, missing):
+        """
+        Stores holdings and arc counters of a plan replay in the places and arcs.
+        """
+        for place, holding in zip(self.places, marking):
+            place.holding = holding
+        for k, transition in enumerate(self.transitions.values()):
+            if fired[k]:
+                for j, outArc in enumerate(transition.out_arcs):
+                    outArc.consumed += fired[k]
+                    outArc.missing += missing[self.planOutArcs[k] + j]
+                for inArc in transition.in_arcs:
+                    inArc.produced += fired[k]
+
+    def runCompiled(self, firing_sequence, count=1):
+        """
+        Same as run, but replays the compiled plan on a list of place holdings.
+        The arc counters and places are updated once at the end of the sequence.
+        :firing_sequence: Sequence of transition names use for run.
+        :count: How often the sequence occurs in the log, the run is weighted by it.
+        """
+        if self.plan is None:
+            self.compile()
+        self.timesRun += count
+        marking = [place.holding for place in self.places]
+        missing = [0] * self.outArcCount
+        fired = self.replayPlan(firing_sequence, marking, missing)
+        self.writeBackPlan(marking, fired, missing)
+        self.calcualteAccuracy(count)
+
+    def planAccuracy(self, marking, fired):
+        """
+        Accuracy of one plan replay, computed like calcualteAccuracy but from the
+        holdings and firing counts instead of the places and arcs.
+        """
+        correct = 0
+        for k, arcs in enumerate(self.planArcs):
+            correct += fired[k] * arcs
+        return self.markingAccuracy(marking, correct)
+
+    def markingAccuracy(self, marking, correct):
+        """
+        Accuracy of a replay that ended in marking after consuming and producing correct tokens.
+        """
+        difference = 0
+        for holding in marking:
+            difference += abs(holding)
+        if difference != 0:
+            difference -= 1
+        if correct != 0:
+            return (correct - difference) / correct
+        return 0
+
+    def evaluate(self, traces, counts, compiled=True, continuations=None):
+        """
+        Token replay of all traces, one after another, followed by calculateFitness.
+        The compiled replay works on the genome only and leaves places and arcs untouched.
+        :traces: The traces or variants of the log.
+        :counts: Frequency of every trace.
+        :compiled: Replay the compiled plan instead of using run.
+        :continuations: Optional output of TraceTrie.continuations for the traces, the compiled replay
+                        then computes the escaping edges precision in the same pass, see replayPrecision.
+        """
+        if continuations is not None:
+            initial = self.initialMarking()
+            for trace, count, observed in zip(traces, counts, continuations):
+                marking = list(initial)
+                fired, escaping, enabled = self.replayPrecision(trace, marking, observed)
+                self.timesRun += count
+                self.accuracy = self.accuracy + self.planAccuracy(marking, fired) * count
+                self.escapingEdges += escaping * count
+                self.enabledEdges += enabled * count
+            self.calculateFitness()
+            self.calculatePrecision()
+            return
+        if not compiled:
+            for trace, count in zip(traces, counts):
+                self.resetTokens()
+                self.run(trace, count)
+            self.calculateFitness()
+            return
+
+        initial = self.initialMarking()
+        for trace, count in zip(traces, counts):
+            marking = list(initial)
+            fired = self.replayPlan(trace, marking)
+            self.timesRun += count
+            self.accuracy = self.accuracy + self.planAccuracy(marking, fired) * count
+        self.calculateFitness()
+
+    def replayPrecision(self, firing_sequence, marking, observed):
+        """
+        Same as replayPlan, but keeps track of the enabled transitions while replaying. Before every
+        event the enabled transitions whose activity never follows this prefix in the log (observed)
+        are escaping edges of the net, behaviour it allows but the log does not show.
+        Returns how often every transition fired, the escaping and the enabled transitions summed over the events.
+        """
+        if self.plan is None:
+            self.compile()
+        if self.planNeeds is None:
+            self.compileEnabling()
+        plan = self.plan
+        index = self.planIndex
+        enabled = [self.isEnabled(t, marking) for t in range(len(self.planNeeds))]
+        enabledCount = sum(enabled)
+        fired = [0] * len(self.planArcs)
+        escaping = 0
+        total = 0
+        for name, names in zip(firing_sequence, observed):
+            used = 0
+            for other in names:
+                t = index.get(other)
+                if t is not None and enabled[t]:
+                    used += 1
+            escaping += enabledCount - used
+            total += enabledCount
+            for k, outs, ins, firstOutArc in plan.get(name, ()):
+                for p in outs:
+                    marking[p] -= 1
+                for p in ins:
+                    marking[p] += 1
+                fired[k] += 1
+                for t in self.planAffected[k]:
+                    now = self.isEnabled(t, marking)
+                    if now != enabled[t]:
+                        enabled[t] = now
+                        enabledCount += 1 if now else -1
+        return fired, escaping, total
+
+    def evaluateDelta(self, traces, counts):
+        """
+        Same as evaluate, but resumes every trace from the checkpoints of a parent at the first
+        event whose transition differs from that parent, instead of replaying it from the start.
+        Records its own checkpoints so the children of this net can do the same.
+        Returns the amount of events that did not have to be replayed.
+        """
+        if self.plan is None:
+            self.compile()
+        initial = tuple(self.initialMarking())
+        resumable = []
+        for parent in self.parents:
+            if parent.checkpointTraces is traces and parent.genome.placeCount <= self.genome.placeCount:
+                resumable.append((parent, self.changedActivities(parent)))
+
+        skipped = 0
+        checkpoints = []
+        for j, (trace, count) in enumerate(zip(traces, counts)):
+            start = 0
+            recorded = [(initial, 0)]
+            for parent, changed in resumable:
+                position = 0
+                while position < len(trace) and trace[position] not in changed:
+                    position += 1
+                if position > start:
+                    start = position
+                    recorded = parent.checkpoints[j][:position + 1]
+            marking, correct = recorded[-1]
+            marking = list(marking) + [0] * (self.genome.placeCount - len(marking))
+            for name in trace[start:]:
+                correct = self.step(name, marking, correct)
+                recorded.append((tuple(marking), correct))
+            checkpoints.append(recorded)
+            skipped += start * count
+            self.timesRun += count
+            self.accuracy = self.accuracy + self.markingAccuracy(marking, correct) * count
+        self.calculateFitness()
+        self.checkpoints = checkpoints
+        self.checkpointTraces = traces
+        self.parents = ()
+        return skipped
+
+    def evaluateBitmask(self, traces, counts, tableSize=4096):
+        """
+        Same as evaluate, but while every place holds 0 or 1 token the marking is kept as a bitmask
+        and the firings of an activity on a marking are looked up in a table kept by the net,
+        so repeated states cost one dict lookup. A trace leaving the safe markings continues
+        on a list of holdings like evaluate.
+        :tableSize: Entries of the table, it is emptied when full.
+        """
+        if self.plan is None:
+            self.compile()
+        if self.transitionTable is None:
+            self.transitionTable = {}
+        table = self.transitionTable
+        for trace, count in zip(traces, counts):
+            mask = 1 # initial marking, one token in place 0
+            correct = 0
+            marking = None
+            for position, name in enumerate(trace):
+                result = table.get((mask, name))
+                if result is None:
+                    result = self.fireMasked(name, mask)
+                    if len(table) >= tableSize:
+                        table.clear()
+                    table[(mask, name)] = result
+                if result is False:
+                    marking = [(mask >> p) & 1 for p in range(self.genome.placeCount)]
+                    for rest in trace[position:]:
+                        correct = self.step(rest, marking, correct)
+                    break
+                mask, arcs = result
+                correct += arcs
+            self.timesRun += count
+            if marking is not None:
+                self.accuracy = self.accuracy + self.markingAccuracy(marking, correct) * count
+                continue
+            difference = bin(mask).count("1")
+            if difference != 0:
+                difference -= 1
+            self.accuracy = self.accuracy + ((correct - difference) / correct if correct != 0 else 0) * count
+        self.calculateFitness()
+
+    def fireMasked(self, name, mask):
+        """
+        Fires the transitions of an activity on a bitmask marking.
+        Returns the new marking and the tokens consumed and produced, False if a place would end up
+        with a holding other than 0 or 1.
+        """
+        holdings = {}
+        arcs = 0
+        for k, outs, ins, firstOutArc in self.plan.get(name, ()):
+            for p in outs:
+                holdings[p] = holdings.get(p, (mask >> p) & 1) - 1
+            for p in ins:
+                holdings[p] = holdings.get(p, (mask >> p) & 1) + 1
+            arcs += self.planArcs[k]
+        for p, holding in holdings.items():
+            if holding == 1:
+                mask |= 1 << p
+            elif holding == 0:
+                mask &= ~(1 << p)
+            else:
+                return False
+        return mask, arcs
+
+    def step(self, name, marking, correct):
+        """
+        Fires the transitions of an activity on marking, returns the new token count.
+        """
+        for k, outs, ins, firstOutArc in self.plan.get(name, ()):
+            for p in outs:
+                marking[p] -= 1
+            for p in ins:
+                marking[p] += 1
+            correct += self.planArcs[k]
+        return correct
+
+    def changedActivities(self, other):
+        """
+        Names of the activities whose transition differs between this net and other.
+        """
+        genome = self.genome
+        otherGenome = other.genome
+        otherIndex = {name: t for t, name in enumerate(otherGenome.activities)}
+        changed = set()
+        for t, name in enumerate(genome.activities):
+            o = otherIndex.get(name)
+            if o is None or genome.getOut(t) != otherGenome.getOut(o) or genome.getIn(t) != otherGenome.getIn(o):
+                changed.add(name)
+        for name in otherIndex:
+            if name not in genome.activities:
+                changed.add(name)
+        return changed
 
     def createGraph(self):
-        graph = graphviz.Digraph("Fittest net")
+        graph = self.buildGraph()
+        graph.render(directory='nets', view=True) 
+
+    def buildGraph(self, name="Fittest net"):
+        """
+        The net as graphviz.Digraph, without rendering it.
+        """
+        graph = graphviz.Digraph(name)
         graph.attr('node', shape = 'box')
         for transition in self.transitions:
             graph.node(transition, transition)
@@ -54,7 +468,7 @@ class PetriNet():
                 graph.edge(str(outArc.place.name), transition)
             for inArc in self.transitions[transition].in_arcs:
                 graph.edge(transition, str(inArc.place.name))
-        graph.render(directory='nets', view=True) 
+        return graph
 
     def printPetrinet(self):
         for transition in self.transitions:
@@ -74,7 +488,30 @@ class PetriNet():
             for inArc in self.transitions[transition].in_arcs:
                 print("Produced ", transition, " : ", inArc.produced)
 
+    def encode(self):
+        """
+        Compact form of the net that is cheap to pickle, e.g. for sending it to worker processes.
+        """
+        return self.genome
+
+    def genotypeKey(self):
+        """
+        Canonical, hashable form of the structure of the net: for every transition the
+        sorted positions of the places it takes from and puts into. Nets with the same
+        key replay every log the same way, regardless of the objects they are built of.
+        """
+        return self.genome.key()
+
+    @staticmethod
+    def decode(encoded):
+        """
+        Rebuilds a net from the output of encode.
+        """
+        return PetriNet(genome=encoded)
+
     def resetTokens(self):
+        if self._transitions is None:
+            return # objects not built yet, they start in the reset state
         for transition in self.transitions:
             for outArc in self.transitions[transition].out_arcs:
                 outArc.consumed = 0
@@ -86,18 +523,21 @@ class PetriNet():
         self.places[0].holding = 1
 
     def resetAll(self):
-        for transition in self.transitions:
-            for outArc in self.transitions[transition].out_arcs:
-                outArc.consumed = 0
-                outArc.missing = 0
-                outArc.place.holding = 0
-            for inArc in self.transitions[transition].in_arcs:
-                inArc.produced = 0
-                inArc.place.holding = 0
-        self.places[0].holding = 1
+        self.resetTokens()
+        self.estimated = False
         self.accuracy = 0.00001
         self.fitness = 0
         self.timesRun = 0
+        self.precision = 0
+        self.escapingEdges = 0
+        self.enabledEdges = 0
+
+    def calculatePrecision(self):
+        if self.enabledEdges == 0:
+            # a net that never enables anything explains nothing of the log
+            self.precision = 0
+        else:
+            self.precision = 1 - self.escapingEdges / self.enabledEdges
 
     def calculateFitness(self):
         if self.timesRun == 0:
@@ -105,7 +545,7 @@ class PetriNet():
         else:
             self.fitness = self.accuracy / self.timesRun 
 
-    def calcualteAccuracy(self):
+    def calcualteAccuracy(self, count=1):
         result = 0
         correct = self.getConsumedAndProducedTokens()
         difference = self.getAllRemainingTokens()
@@ -113,7 +553,7 @@ class PetriNet():
             result = (correct - difference) / correct
         else:
             result = 0
-        self.accuracy = self.accuracy + result
+        self.accuracy = self.accuracy + result * count
 
     # Counts all tokens remaining in the self with absolute values. [-1, 1, 0] => 2 remaining tokens
     def getAllRemainingTokens(self):
@@ -137,32 +577,29 @@ class PetriNet():
         return sum
     
     def mutate(self):
+        genome = self.genome
+        self.dropObjects()
         for i in range(0, random.randint(1,3)):
             n = random.randint(0,2)
 
             # add place
             if n == 0:
-                t_index = random.randint(0, len(self.transitions) - 1)
+                t_index = random.randint(0, len(genome.activities) - 1)
                 out_or_in = random.randint(0,1)
                 if out_or_in == 0:
-                    p_index = random.randint(0, len(self.places) - 1)
-                    # needed because transitions is a dict, p_index is fine because places is list type
-                    Tkey = list(self.transitions)[t_index]
-                    self.transitions[Tkey].out_arcs.append(Out(self.places[p_index]))
+                    p_index = random.randint(0, genome.placeCount - 1)
+                    genome.addOut(t_index, p_index)
                 else:
-                    p_index = random.randint(0, len(self.places) - 1)
-                    Tkey = list(self.transitions)[t_index]
-                    self.transitions[Tkey].in_arcs.append(In(self.places[p_index]))
+                    p_index = random.randint(0, genome.placeCount - 1)
+                    genome.addIn(t_index, p_index)
 
             # delete place
             elif n == 1:
-                t_index = random.randint(0, len(self.transitions) - 1)
+                t_index = random.randint(0, len(genome.activities) - 1)
                 out_or_in = random.randint(0,1)
                 if out_or_in == 0:
-                    Tkey = list(self.transitions)[t_index]
-                    if len(self.transitions[Tkey].out_arcs) == 0:
-                        self.transitions[Tkey].out_arcs.pop()
+                    if genome.countOut(t_index) == 0:
+                        genome.popOut(t_index)
                 else:
-                    Tkey = list(self.transitions)[t_index]
-                    if len(self.transitions[Tkey].out_arcs) == 0:
-                        self.transitions[Tkey].in_arcs.pop()
\ No newline at end of file
+                    if genome.countOut(t_index) == 0:
+                        genome.popIn(t_index)
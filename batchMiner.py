@@ -0,0 +1,159 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from genetic_miner import geneticMiner
+from genome import Genome
+from Petrinet import PetriNet
+
+"""
+Mines many logs on one shared pool of processes and writes a summary table and the fittest
+net of every log as Graphviz source (nothing is rendered), e.g.
+  python batchMiner.py logs --workers 4 --time-budget 60 --output results
+"""
+
+def mineLog(path, settings, seed, targetFitness, maxGenerations, timeBudget):
+    """
+    Mines one log in a worker process until one of the stop conditions of the miner is met.
+    """
+    start = time.perf_counter()
+    random.seed(seed)
+    miner = geneticMiner()
+    miner.verbose = False
+    miner.targetFitness = targetFitness
+    miner.generations = maxGenerations
+    miner.timeBudget = timeBudget
+    for name, value in settings.items():
+        setattr(miner, name, value)
+    miner.startTime = start
+    stopReason = miner.mine(path)
+    best = miner.listOfPetrinets[0]
+    return {"log": path, "bestFitness": miner.bestFitness, "generations": miner.doneGenerations,
+            "seconds": time.perf_counter() - start, "replays": miner.replayedTraces, "stopReason": stopReason,
+            "activities": miner.allActivities, "genome": best.genome.pack()}
+
+
+def findLogs(pattern):
+    """
+    The logs of a directory (CSV and XES files) or matching a glob pattern, sorted by path.
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if name.lower().endswith((".csv", ".xes", ".xes.gz"))]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(paths)
+
+
+def logNames(paths):
+    """
+    Names of the logs in the summary and of their nets: the paths relative to the directory all logs are in,
+    so logs with the same file name in different directories do not overwrite each other.
+    """
+    if len(paths) == 0:
+        return []
+    paths = [os.path.abspath(path) for path in paths]
+    common = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return [os.path.relpath(path, common) for path in paths]
+
+
+def parseSettings(assignments):
+    """
+    geneticMiner attributes given as name=value, values are read as JSON if possible.
+    """
+    settings = {}
+    probe = geneticMiner()
+    for assignment in assignments:
+        name, separator, value = assignment.partition("=")
+        if not separator or not hasattr(probe, name) or callable(getattr(probe, name)):
+            raise ValueError("unknown setting {}".format(assignment))
+        try:
+            settings[name] = json.loads(value)
+        except ValueError:
+            settings[name] = value
+    if settings.get("workers", 1) > 1:
+        # every job would start its own evaluation processes next to the --workers jobs running at once,
+        # oversubscribing the cores
+        raise ValueError("workers cannot be set for batch jobs, the logs are already mined in parallel, use --workers")
+    for name, value in settings.items():
+        setattr(probe, name, value)
+    probe.checkSettings()
+    return settings
+
+
+def runBatch(paths, settings, workers, seed, targetFitness, maxGenerations, timeBudget, output):
+    """
+    Mines all logs on one pool, writes <output>/<log name>.gv for every log (see logNames, logs in
+    subdirectories get subdirectories of output) and <output>/summary.csv.
+    Returns the summary rows in the order of paths.
+    """
+    os.makedirs(output, exist_ok=True)
+    names = dict(zip(paths, logNames(paths)))
+    rows = {}
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(mineLog, path, settings, seed, targetFitness, maxGenerations, timeBudget): path
+                   for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            name = names[path]
+            try:
+                result = future.result()
+            except Exception as error:
+                rows[path] = {"log": name, "bestFitness": None, "generations": None, "seconds": None,
+                              "replays": None, "status": "error: {!r}".format(error)}
+                continue
+            net = PetriNet(genome=Genome.unpack(result["activities"], result["genome"]))
+            net.buildGraph(name).save(name + ".gv", directory=output)
+            rows[path] = {"log": name, "bestFitness": result["bestFitness"], "generations": result["generations"],
+                          "seconds": result["seconds"], "replays": result["replays"],
+                          "status": result["stopReason"]}
+    rows = [rows[path] for path in paths]
+    with open(os.path.join(output, "summary.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["log", "bestFitness", "generations", "seconds", "replays", "status"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def printSummary(rows):
+    print("{:<36} {:>12} {:>11} {:>9} {:>12}  {}".format("log", "bestFitness", "generations", "seconds", "replays", "status"))
+    for row in rows:
+        if row["bestFitness"] is None:
+            print("{:<36} {:>12} {:>11} {:>9} {:>12}  {}".format(row["log"], "-", "-", "-", "-", row["status"]))
+        else:
+            print("{:<36} {:>12.4f} {:>11} {:>9.2f} {:>12}  {}".format(row["log"], row["bestFitness"], row["generations"],
+                                                                       row["seconds"], row["replays"], row["status"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mines every log of a directory or glob pattern on one process pool.")
+    parser.add_argument("logs", help="directory or glob pattern of the logs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds per log")
+    parser.add_argument("--stagnation", type=int, default=None, help="stop a log after this many generations without improvement")
+    parser.add_argument("--max-generations", type=int, default=1000)
+    parser.add_argument("--target", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--population", type=int, default=100)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="further geneticMiner attributes, e.g. --set replayEngine=bitmask --set heuristicShare=0.2")
+    parser.add_argument("--output", default="nets")
+    args = parser.parse_args()
+
+    paths = findLogs(args.logs)
+    if len(paths) == 0:
+        parser.error("no logs found for {}".format(args.logs))
+    try:
+        settings = parseSettings(args.set)
+    except ValueError as error:
+        parser.error(str(error))
+    settings.setdefault("populationSize", args.population)
+    settings.setdefault("stagnationLimit", args.stagnation)
+    start = time.perf_counter()
+    rows = runBatch(paths, settings, args.workers, args.seed, args.target, args.max_generations, args.time_budget, args.output)
+    printSummary(rows)
+    print("Time: ", time.perf_counter() - start, " seconds")
@@ -0,0 +1,229 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from genetic_miner import geneticMiner
+from logGenerator import LogGenerator, parallelLoopNet
+from logReader import logreader
+
+"""
+Reproducible benchmarks of replay and evolution throughput.
+
+Runs over the bundled logs and synthetic logs of growing size with fixed seeds and writes
+the results as JSON, so two commits can be compared with a plain diff, via
+  python benchmark.py --output bench.json
+"""
+
+ENGINES = ["object", "compiled", "matrix", "trie", "delta", "bitmask"]
+
+
+def loadTraces(path):
+    reader = logreader()
+    traces = reader.readLogs(path)
+    return traces, reader.getAllActivities()
+
+
+def syntheticTraces(amount, seed):
+    """
+    Synthetic log of amount traces simulated from logGenerator.parallelLoopNet. Unlike copies of a
+    bundled log most of its traces are distinct, so the replayed variants grow with the log.
+    """
+    reader = logreader()
+    reader.traces = list(LogGenerator(parallelLoopNet(), seed).generate(amount))
+    return reader.traces, reader.getAllActivities()
+
+
+def countVariants(traces):
+    return len(set(tuple(trace) for trace in traces))
+
+
+def createMiner(activities, populationSize, seed, **settings):
+    random.seed(seed)
+    miner = geneticMiner()
+    miner.verbose = False
+    miner.allActivities = activities
+    miner.populationSize = populationSize
+    for name, value in settings.items():
+        setattr(miner, name, value)
+    miner.initializeStartingPopulation()
+    return miner
+
+
+def timed(function, minSeconds):
+    """
+    Calls function until minSeconds passed, returns calls and seconds.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        seconds = time.perf_counter() - start
+        if seconds >= minSeconds:
+            return calls, seconds
+
+
+def benchmarkRun(traces, activities, seed, minSeconds):
+    """
+    Replays per second of PetriNet.run on the objects of one random net.
+    """
+    net = createMiner(activities, 1, seed).listOfPetrinets[0]
+    def replayLog():
+        for trace in traces:
+            net.resetTokens()
+            net.run(trace)
+    calls, seconds = timed(replayLog, minSeconds)
+    return {"replaysPerSecond": calls * len(traces) / seconds}
+
+
+def benchmarkEvaluation(traces, activities, populationSize, seed, minSeconds):
+    """
+    Nets evaluated per second by evaluatePopulation for every replay engine, without the fitness cache.
+    The nets are a generation of mutated offspring of an evaluated population, like in a run, so the
+    delta engine can resume from their parents. For it the share of events skipped that way is given too.
+    """
+    reader = logreader()
+    reader.traces = traces
+    variants, counts = reader.getVariants()
+    events = sum(len(variant) * count for variant, count in zip(variants, counts))
+    results = {}
+    for engine in ENGINES:
+        miner = createMiner(activities, populationSize, seed, replayEngine=engine, fitnessCacheSize=0)
+        miner.evaluatePopulation(variants, counts)
+        parents = miner.listOfPetrinets
+        offspring = [miner.crossOver(random.choice(parents), random.choice(parents)) for i in range(populationSize)]
+        for net in random.sample(offspring, int(populationSize * miner.mutateRate)):
+            net.mutate()
+        lineage = [(net, net.parents) for net in offspring]
+        miner.listOfPetrinets = offspring
+        miner.skippedEvents = 0
+        def evaluateOffspring():
+            # evaluateDelta forgets the parents of a net once it is evaluated
+            for net, netParents in lineage:
+                net.parents = netParents
+            miner.evaluatePopulation(variants, counts)
+        calls, seconds = timed(evaluateOffspring, minSeconds)
+        results[engine] = {"netsPerSecond": calls * populationSize / seconds}
+        if engine == "delta":
+            results[engine]["skippedEventShare"] = miner.skippedEvents / (calls * populationSize * events)
+    return results
+
+
+def benchmarkOperators(activities, populationSize, seed, minSeconds):
+    """
+    crossOver and mutate operations per second.
+    """
+    miner = createMiner(activities, populationSize, seed)
+    nets = miner.listOfPetrinets
+    calls, seconds = timed(lambda: miner.crossOver(nets[random.randint(0, len(nets) - 1)], nets[random.randint(0, len(nets) - 1)]), minSeconds)
+    crossOvers = calls / seconds
+    calls, seconds = timed(lambda: nets[random.randint(0, len(nets) - 1)].mutate(), minSeconds)
+    return {"crossOverPerSecond": crossOvers, "mutatePerSecond": calls / seconds}
+
+
+def benchmarkMemory(traces, activities, populationSize, seed):
+    """
+    Peak traced memory of creating and evaluating a population.
+    """
+    reader = logreader()
+    reader.traces = traces
+    variants, counts = reader.getVariants()
+    tracemalloc.start()
+    miner = createMiner(activities, populationSize, seed)
+    miner.evaluatePopulation(variants, counts)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peakBytes": peak}
+
+
+def benchmarkEvolution(traces, activities, populationSize, seed, targetFitness, maxGenerations, **settings):
+    """
+    Generations and seconds until the best net reaches targetFitness, None if it is not reached
+    within maxGenerations.
+    """
+    reader = logreader()
+    reader.traces = traces
+    variants, counts = reader.getVariants()
+    miner = createMiner(activities, populationSize, seed, traces=traces, **settings)
+    start = time.perf_counter()
+    while miner.bestFitness < targetFitness and miner.doneGenerations < maxGenerations:
+        miner.runGeneration(variants, counts)
+    seconds = time.perf_counter() - start
+    reached = miner.bestFitness >= targetFitness
+    return {"generationsToTarget": miner.doneGenerations if reached else None,
+            "secondsToTarget": seconds if reached else None,
+            "bestFitness": miner.bestFitness,
+            "generations": miner.doneGenerations,
+            "generationsPerSecond": miner.doneGenerations / seconds}
+
+
+def benchmarkSeeding(traces, activities, populationSize, seed, targetFitness, maxGenerations, heuristicShare, randomStart):
+    """
+    Evolution with a share of the starting population built from the causal matrix of the log,
+    and the generations to the target it saves against the random start.
+    :randomStart: Result of benchmarkEvolution with the same arguments.
+    """
+    seeded = benchmarkEvolution(traces, activities, populationSize, seed, targetFitness, maxGenerations, heuristicShare=heuristicShare)
+    gain = None
+    if randomStart["generationsToTarget"] is not None and seeded["generationsToTarget"] is not None:
+        gain = randomStart["generationsToTarget"] - seeded["generationsToTarget"]
+    # the random run never reaching the target counts as maxGenerations
+    elif seeded["generationsToTarget"] is not None:
+        gain = maxGenerations - seeded["generationsToTarget"]
+    return {"heuristicShare": heuristicShare, "seeded": seeded, "generationsSaved": gain}
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of replay and evolution throughput.")
+    parser.add_argument("--logs", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "*.CSV"))
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[1000, 10000], help="amounts of traces of the synthetic logs")
+    parser.add_argument("--population", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="minimum duration of every throughput measurement")
+    parser.add_argument("--target", type=float, default=0.9)
+    parser.add_argument("--max-generations", type=int, default=50)
+    parser.add_argument("--heuristic-share", type=float, default=0.5, help="share of the population seeded from the causal matrix")
+    parser.add_argument("--output", default=None, help="JSON file, printed when not given")
+    args = parser.parse_args()
+
+    results = {"commit": gitCommit(), "python": platform.python_version(), "seed": args.seed,
+               "population": args.population, "logs": {}}
+    logs = [(os.path.basename(path), loadTraces(path)) for path in sorted(glob.glob(args.logs))]
+    logs += [("synthetic-{}".format(amount), syntheticTraces(amount, args.seed)) for amount in args.synthetic]
+    for name, (traces, activities) in logs:
+        evolution = benchmarkEvolution(traces, activities, args.population, args.seed, args.target, args.max_generations)
+        results["logs"][name] = {
+            "traces": len(traces),
+            "variants": countVariants(traces),
+            "run": benchmarkRun(traces, activities, args.seed, args.min_seconds),
+            "evaluation": benchmarkEvaluation(traces, activities, args.population, args.seed, args.min_seconds),
+            "operators": benchmarkOperators(activities, args.population, args.seed, args.min_seconds),
+            "memory": benchmarkMemory(traces, activities, args.population, args.seed),
+            "evolution": evolution,
+            "seeding": benchmarkSeeding(traces, activities, args.population, args.seed, args.target, args.max_generations,
+                                        args.heuristic_share, evolution),
+        }
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
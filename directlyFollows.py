@@ -0,0 +1,97 @@
+import numpy as np
+
+class DirectlyFollows():
+
+    def __init__(self):
+        """
+        Directly-follows counts of a log and the relations derived from them: a is causal to b if b
+        directly follows a but never the other way round, parallel if both happen and unrelated
+        (a choice) if neither does. Traces can be added at any time, the counts are updated in place.
+        """
+        self.activities = [] # activity names, the position of a name is its row and column
+        self.activityCodes = {}
+        self.matrix = np.zeros((0, 0), dtype=np.int64) # matrix[a, b]: how often b directly follows a
+        self.startCounts = np.zeros(0, dtype=np.int64)
+        self.endCounts = np.zeros(0, dtype=np.int64)
+        self.traceCount = 0
+
+    def intern(self, activity):
+        code = self.activityCodes.get(activity)
+        if code is None:
+            code = len(self.activities)
+            self.activityCodes[activity] = code
+            self.activities.append(activity)
+        return code
+
+    def grow(self):
+        n = len(self.activities)
+        missing = n - len(self.startCounts)
+        if missing > 0:
+            self.matrix = np.pad(self.matrix, ((0, missing), (0, missing)))
+            self.startCounts = np.pad(self.startCounts, (0, missing))
+            self.endCounts = np.pad(self.endCounts, (0, missing))
+
+    def add(self, traces, counts=None):
+        """
+        Adds traces of activity names.
+        :counts: Optional frequency of every trace, e.g. the counts of logreader.getVariants.
+        """
+        lengths = np.fromiter((len(trace) for trace in traces), dtype=np.int64, count=len(traces))
+        codes = np.fromiter((self.intern(activity) for trace in traces for activity in trace), dtype=np.int64, count=int(lengths.sum()))
+        self.addEncoded(codes, lengths, counts)
+
+    def addEncoded(self, codes, lengths, counts=None):
+        """
+        Adds traces given as the concatenated activity codes (see intern) and the length of every trace,
+        in one vectorized pass.
+        """
+        self.grow()
+        n = len(self.activities)
+        codes = np.asarray(codes, dtype=np.int64)
+        weights = np.ones(len(lengths), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        ends = np.cumsum(lengths)
+        nonempty = lengths > 0
+        self.startCounts += np.bincount(codes[(ends - lengths)[nonempty]], weights[nonempty], minlength=n).astype(np.int64)
+        self.endCounts += np.bincount(codes[ends[nonempty] - 1], weights[nonempty], minlength=n).astype(np.int64)
+
+        # pairs of neighbouring events, except the last event of a trace and the first of the next one
+        hasSuccessor = np.ones(len(codes), dtype=bool)
+        hasSuccessor[ends[nonempty] - 1] = False
+        positions = np.flatnonzero(hasSuccessor)
+        pairs = codes[positions] * n + codes[positions + 1]
+        pairWeights = np.repeat(weights, lengths)[positions]
+        self.matrix += np.bincount(pairs, pairWeights, minlength=n * n).astype(np.int64).reshape(n, n)
+        self.traceCount += int(weights.sum())
+
+    def follows(self):
+        """
+        Boolean matrix, [a, b] is set if b directly follows a at least once.
+        """
+        return self.matrix > 0
+
+    def causal(self):
+        follows = self.follows()
+        return follows & ~follows.T
+
+    def parallel(self):
+        follows = self.follows()
+        return follows & follows.T
+
+    def unrelated(self):
+        follows = self.follows()
+        return ~follows & ~follows.T
+
+    def startActivities(self):
+        return [self.activities[code] for code in np.flatnonzero(self.startCounts)]
+
+    def endActivities(self):
+        return [self.activities[code] for code in np.flatnonzero(self.endCounts)]
+
+    def inputs(self, activity):
+        """
+        Activities directly preceding the activity, at any occurrence.
+        """
+        return [self.activities[code] for code in np.flatnonzero(self.matrix[:, self.activityCodes[activity]])]
+
+    def outputs(self, activity):
+        return [self.activities[code] for code in np.flatnonzero(self.matrix[self.activityCodes[activity]])]
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+class FitnessCache():
+
+    def __init__(self, maxSize=1000):
+        """
+        Bounded LRU cache of replay results, keyed by PetriNet.genotypeKey.
+        :maxSize: Amount of nets kept, the least recently used one is evicted first.
+        """
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the cached result of the key, see geneticMiner.replayResult, or None.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
@@ -1,10 +1,17 @@
 import random
 from logReader import logreader
 from Petrinet import PetriNet
-from transition import Transition
-from place import Place
-from arc import In
-from arc import Out
+from matrixReplay import MatrixReplay
+from parallelEvaluation import ParallelEvaluator
+from fitnessCache import FitnessCache
+from genome import Genome
+from directlyFollows import DirectlyFollows
+from prefixTree import TraceTrie
+from racing import RacingEvaluator
+from contextlib import nullcontext
+import os
+import pickle
+import sys
 import time
 
 """
@@ -27,6 +34,7 @@ class geneticMiner():
 
     def __init__(self):
         self.allActivities = None
+        self.traces = None
         self.generations = 1000
         self.populationSize = 100
         self.mutateRate = 0.1
@@ -35,107 +43,202 @@ class geneticMiner():
         self.listOfPetrinets = []
         self.doneGenerations = 0
         self.bestFitness = 0
-
-    def createTransitions(self, listOfTransitions, listOfPlaces):
-        transitionsList = {}
+        self.verbose = True # print the progress of every generation
+        self.replayEngine = "compiled" # "compiled" replays PetriNet.compile plans, "object" the Transition objects, "matrix" uses MatrixReplay, "trie" uses TraceTrie, "delta" resumes offspring from checkpoints of their parents (only with workers = 1), "bitmask" memoizes firings on safe markings
+        self.matrixReplay = None
+        self.traceTrie = None
+        self.skippedEvents = 0 # events the "delta" engine did not have to replay
+        self.workers = 1 # amount of processes evaluating the population, 1 evaluates in this process
+        self.parallelEvaluator = None
+        self.fitnessCacheSize = 1000 # amount of replay results kept for known nets, 0 disables the cache
+        self.fitnessCache = None
+        self.evaluatedTraces = None # log the replay caches and evaluators were built for, see useLog
+        self.evaluatedCounts = None
+        self.racingSchedule = None # e.g. (0.1, 0.3, 1.0) to race the nets on growing trace samples, see RacingEvaluator
+        self.racingKeepFraction = 0.5
+        self.racingEvaluator = None
+        self.telemetry = None # Telemetry receiving the timings and statistics of every generation
+        self.replayedNets = 0
+        self.replayedTraces = 0
+        self.checkpointPath = None # file the state of the run is saved to, see saveCheckpoint
+        self.checkpointGenerations = 10 # save every this many generations, None to not save by generations
+        self.checkpointSeconds = None # save when this many seconds passed since the last save
+        self.lastCheckpoint = time.perf_counter()
+        self.heuristicShare = 0.0 # share of the starting population built from the causal matrix of the log
+        self.heuristicNoise = 0.1 # probability to drop every arc of a heuristic net and to add a random one per transition side
+        self.relations = None # DirectlyFollows of the loaded traces
+        self.precisionWeight = 0.0 # > 0 ranks nets by (1 - weight) * replay fitness + weight * precision, needs the compiled engine in this process, see checkSettings
+        self.continuations = None
+        self.continuationTraces = None
+        self.replacement = "generational" # "generational" keeps the elites and fills up with offspring and random nets, "steady-state" replaces only the worst nets by the offspring
+        self.populationMemoryLimit = None # bytes the genomes of the population may use, the last nets are dropped beyond it
+        self.recycledNets = [] # discarded nets whose objects and genomes are reused for new nets
+        self.targetFitness = 0.9 # stop conditions of main, see shouldStop, generations is the maximum of generations
+        self.timeBudget = None # seconds
+        self.stagnationLimit = None # generations without improvement of the best fitness
+        self.startTime = None
+        self.lastImprovement = 0 # generation the best fitness improved last
+        self.adaptiveRates = True # raise mutateRate and crossOverRate while the search stagnates
+        self.adaptAfter = 10 # generations without improvement before the rates are raised
+        self.adaptFactor = 1.5
+        self.baseRates = None # mutateRate and crossOverRate the rates return to after an improvement
+        self.useLogCache = True # load logs through their binary cache next to the file, see logCache.py
+        self.eventColumns = {} # columns of event logs with one event per row, see logreader.streamCases
+        self.encodedLog = None
+
+    def createTransitions(self, listOfTransitions, amountOfPlaces, genome=None):
+        """
+        Creates the genome of a random net.
+        :listOfTransitions: The activities, one transition is created for each.
+        :amountOfPlaces: Amount of places of the net, place 1 holds the start token.
+        :genome: Optional genome to reuse instead of allocating a new one.
+        """
+        if genome is None:
+            genome = Genome(listOfTransitions, max(1, amountOfPlaces))
+        else:
+            genome.clear(listOfTransitions, max(1, amountOfPlaces))
         for transition in listOfTransitions:
-            
-            duplicateList = []
+
+            usedPlaces = set()
             listOfOut = []
             listOfIn = []
 
             # checks if arc already exists to avoid 1-loops since most nets 
             # dont have 1-loops anyways it also improves the accuarcy of the nets.
             # Can be removed if wanted, tokenreplay also works with 1-loops.
-            alreadyExists = False
-            
             amountOfOutArcs = random.randint(1,3)
             amountOfInArcs = random.randint(1,3)
 
             for i in range(amountOfOutArcs):
-                index = random.randint(0, len(listOfPlaces) -1 )
-                for outArc in duplicateList:
-                    if listOfPlaces[index].name == outArc.place.name:
-                        alreadyExists = True
-                if not alreadyExists:
-                    duplicateList.append(Out(listOfPlaces[index]))
-                    listOfOut.append(Out(listOfPlaces[index]))
-                alreadyExists = False
+                index = random.randint(0, genome.placeCount - 1)
+                if index not in usedPlaces:
+                    usedPlaces.add(index)
+                    listOfOut.append(index)
 
             for i in range(amountOfInArcs):
-                index = random.randint(0, len(listOfPlaces) -1 )
-                for inArc in duplicateList:
-                    if listOfPlaces[index].name == inArc.place.name:
-                        alreadyExists = True
-                if not alreadyExists:
-                    duplicateList.append(In(listOfPlaces[index]))
-                    listOfIn.append(In(listOfPlaces[index]))
-                alreadyExists = False
-
-            transitionsList[transition] = Transition(transition, listOfOut, listOfIn)
-
-        return transitionsList
-
-    def createPlaces(self, amountOfPlaces):
-        listOfPlaces = [Place(1,1)]
-        for i in range(amountOfPlaces):
-            if i > 0:
-                listOfPlaces.append(Place(0, i + 1))
-        return listOfPlaces
+                index = random.randint(0, genome.placeCount - 1)
+                if index not in usedPlaces:
+                    usedPlaces.add(index)
+                    listOfIn.append(index)
+
+            genome.appendTransition(listOfOut, listOfIn)
+
+        return genome
 
     def crossOver(self, petriNet1, petriNet2):
-        if len(petriNet1.places) < len(petriNet2.places):
-            places = self.createPlaces(len(petriNet2.places))
+        genome1 = petriNet1.genome
+        genome2 = petriNet2.genome
+        recycled = self.recycledNets.pop() if self.recycledNets else None
+        if recycled is None:
+            genome = Genome(self.allActivities, max(genome1.placeCount, genome2.placeCount))
         else:
-            places = self.createPlaces(len(petriNet1.places))
+            genome = recycled.genome
+            genome.clear(self.allActivities, max(genome1.placeCount, genome2.placeCount))
 
-        transitionList = {}
-        complete = False
-        while not complete:
-            listOfIn = []
-            listOfOut = []
+        # random parent for random activities until every activity has one, the first draw counts
+        parents = [None] * len(self.allActivities)
+        missing = len(self.allActivities)
+        while missing > 0:
             n = random.randint(0,1)
             i = random.randint(0, len(self.allActivities) - 1)
-            if n == 0:
-                Tkey = list(petriNet1.transitions)[i]
-                if Tkey not in transitionList:
-                    for outArc in petriNet1.transitions[Tkey].out_arcs:
-                        listOfOut.append(Out(places[int(outArc.place.name) - 1]))
-                    for inArc in petriNet1.transitions[Tkey].in_arcs:
-                        listOfIn.append(In(places[int(inArc.place.name) - 1]))
-                    transitionList[Tkey] = (Transition(Tkey, listOfOut, listOfIn))
+            if parents[i] is None:
+                parents[i] = genome1 if n == 0 else genome2
+                missing -= 1
+
+        for t, parent in enumerate(parents):
+            genome.appendTransition(parent.getOut(t), parent.getIn(t))
+        child = PetriNet(genome=genome) if recycled is None else recycled.reuse(genome)
+        child.parents = (petriNet1, petriNet2)
+        return child
+
+    def createHeuristicTransitions(self, relations, noise):
+        """
+        Creates the genome of a net following the causal relations of the log, in the manner of the alpha algorithm.
+        Every place connects unrelated activities to unrelated activities, so choices share a place
+        and parallel branches get places of their own. Start activities take from place 0,
+        end activities put into a shared end place.
+        :relations: DirectlyFollows of the log.
+        :noise: Probability to drop every arc and to add a random arc per transition side.
+        """
+        index = [relations.activityCodes[a] for a in self.allActivities]
+        causalMatrix = relations.causal()
+        unrelatedMatrix = relations.unrelated()
+        def unrelated(a, b):
+            return unrelatedMatrix[index[a], index[b]]
+        starts = set(relations.activityCodes[a] for a in relations.startActivities())
+        ends = set(relations.activityCodes[a] for a in relations.endActivities())
+
+        # activities are referred to by their transition index
+        places = []
+        for a in range(len(self.allActivities)):
+            groups = []
+            for b in range(len(self.allActivities)):
+                if a == b or not causalMatrix[index[a], index[b]]:
+                    continue
+                for group in groups:
+                    if all(unrelated(b, c) for c in group):
+                        group.append(b)
+                        break
                 else:
-                    pass
-            else:
-                Tkey = list(petriNet2.transitions)[i]
-                if Tkey not in transitionList:
-                    for outArc in petriNet2.transitions[Tkey].out_arcs:
-                        listOfOut.append(Out(places[int(outArc.place.name) - 1]))
-                    for inArc in petriNet2.transitions[Tkey].in_arcs:
-                        listOfIn.append(In(places[int(inArc.place.name) - 1]))
-                    transitionList[Tkey] = (Transition(Tkey, listOfOut, listOfIn))
+                    groups.append([b])
+            for group in groups:
+                # places leading to the same activities are merged if their sources are unrelated
+                for inputs, outputs in places:
+                    if outputs == group and all(unrelated(a, c) for c in inputs):
+                        inputs.append(a)
+                        break
                 else:
-                    pass
-            complete = True
-            for char in self.allActivities:
-                if char not in transitionList:
-                    complete = False
-        return PetriNet(transitionList, places)
+                    places.append(([a], group))
+
+        genome = Genome(self.allActivities, len(places) + 2)
+        end = len(places) + 1
+        for a in range(len(self.allActivities)):
+            listOfOut = [0] if index[a] in starts else []
+            listOfOut += [i + 1 for i, (inputs, outputs) in enumerate(places) if a in outputs]
+            listOfIn = [i + 1 for i, (inputs, outputs) in enumerate(places) if a in inputs]
+            if index[a] in ends:
+                listOfIn.append(end)
+            listOfOut = [place for place in listOfOut if random.random() >= noise]
+            listOfIn = [place for place in listOfIn if random.random() >= noise]
+            # like the random nets every transition takes from at least one place, mutate relies on it
+            if random.random() < noise or len(listOfOut) == 0:
+                listOfOut.append(random.randint(0, genome.placeCount - 1))
+            if random.random() < noise:
+                listOfIn.append(random.randint(0, genome.placeCount - 1))
+            genome.appendTransition(listOfOut, listOfIn)
+        return genome
 
     def initializeStartingPopulation(self):
-        for i in range(self.populationSize):
+        heuristic = round(self.populationSize * self.heuristicShare)
+        if heuristic > 0:
+            if self.relations is None:
+                self.relations = DirectlyFollows()
+                if self.encodedLog is not None:
+                    # the variants with their counts give the same relations as all traces
+                    for activity in self.encodedLog.vocabulary:
+                        self.relations.intern(activity)
+                    self.relations.addEncoded(self.encodedLog.variantCodes, self.encodedLog.variantLengths(), self.encodedLog.counts)
+                else:
+                    self.relations.add(self.traces)
+            for i in range(heuristic):
+                genome = self.createHeuristicTransitions(self.relations, self.heuristicNoise)
+                self.listOfPetrinets.append(PetriNet(genome=genome))
+        for i in range(self.populationSize - heuristic):
             amountOfPlaces = len(self.allActivities) + random.randint(0, round(len(self.allActivities)/2))
-            listOfPlaces = self.createPlaces(amountOfPlaces)
-            transitions = self.createTransitions(self.allActivities, listOfPlaces)
-            self.listOfPetrinets.append(PetriNet(transitions, listOfPlaces))
+            genome = self.createTransitions(self.allActivities, amountOfPlaces)
+            self.listOfPetrinets.append(PetriNet(genome=genome))
     
     def initializeNextPopulation(self, bestindivduals, offspring):
         newPopulation = self.populationSize - bestindivduals - offspring
         for i in range(0, newPopulation):
             amountOfPlaces = len(self.allActivities) + random.randint(0, round(len(self.allActivities)/2))
-            listOfPlaces = self.createPlaces(amountOfPlaces)
-            transitions = self.createTransitions(self.allActivities, listOfPlaces)
-            self.listOfPetrinets.append(PetriNet(transitions, listOfPlaces))  
+            recycled = self.recycledNets.pop() if self.recycledNets else None
+            if recycled is None:
+                genome = self.createTransitions(self.allActivities, amountOfPlaces)
+                self.listOfPetrinets.append(PetriNet(genome=genome))
+            else:
+                genome = self.createTransitions(self.allActivities, amountOfPlaces, recycled.genome)
+                self.listOfPetrinets.append(recycled.reuse(genome))
 
     def doCrossOver(self, bestIndividuals):
         listOfOffspring = []
@@ -145,52 +248,428 @@ class geneticMiner():
             listOfOffspring.append(self.crossOver(bestIndividuals[n], bestIndividuals[m]))
         return listOfOffspring
 
-    def main(self):
-        self.generations = 1000
-        csv_datei = "logs/small_example_net_complete.csv"
+    def evaluatePopulation(self, traces, counts=None):
+        """
+        Token replay of all traces for every net of the population.
+        Nets whose structure is in the fitness cache are not replayed again.
+        :traces: The traces or variants of the log.
+        :counts: Optional frequency of every variant, every replay is weighted by it.
+        """
+        self.checkSettings()
+        if counts is None:
+            counts = [1] * len(traces)
+        self.useLog(traces, counts)
+        for net in self.listOfPetrinets:
+            net.resetAll()
+        if self.fitnessCacheSize <= 0:
+            self.evaluateNets(self.listOfPetrinets, traces, counts)
+            return
+
+        if self.fitnessCache is None:
+            self.fitnessCache = FitnessCache(self.fitnessCacheSize)
+        pending = {}
+        for net in self.listOfPetrinets:
+            key = net.genotypeKey()
+            if key in pending:
+                # identical nets of this generation are replayed only once
+                pending[key].append(net)
+                continue
+            cached = self.fitnessCache.get(key)
+            if cached is not None:
+                self.setReplayResult(net, cached)
+            else:
+                pending[key] = [net]
+        self.evaluateNets([nets[0] for nets in pending.values()], traces, counts)
+        for key, nets in pending.items():
+            result = self.replayResult(nets[0])
+            if not nets[0].estimated:
+                self.fitnessCache.put(key, result)
+            for net in nets[1:]:
+                self.setReplayResult(net, result)
+                net.estimated = nets[0].estimated
+
+    def useLog(self, traces, counts):
+        """
+        Drops the fitness cache, the continuations and the evaluators built for another log, every
+        result depends on the traces and on their counts.
+        """
+        counts = list(counts)
+        if self.evaluatedTraces is traces and self.evaluatedCounts == counts:
+            return
+        if self.fitnessCache is not None:
+            self.fitnessCache.clear()
+        self.continuations = None
+        self.continuationTraces = None
+        self.matrixReplay = None
+        self.traceTrie = None
+        self.racingEvaluator = None
+        self.closeWorkers()
+        self.evaluatedTraces = traces
+        self.evaluatedCounts = counts
+
+    @staticmethod
+    def replayResult(net):
+        """
+        Everything an evaluation stores on a net, as kept by the fitness cache.
+        """
+        return (net.accuracy, net.timesRun, net.fitness, net.precision, net.escapingEdges, net.enabledEdges)
+
+    @staticmethod
+    def setReplayResult(net, result):
+        net.accuracy, net.timesRun, net.fitness, net.precision, net.escapingEdges, net.enabledEdges = result
+
+    def checkSettings(self):
+        """
+        Raises a ValueError for settings that cannot be combined.
+        """
+        if self.workers > 1 and self.replayEngine == "delta":
+            # the workers only receive the encoded nets, not the parents and checkpoints the delta replay resumes from
+            raise ValueError("the delta replayEngine cannot run on workers, use workers = 1")
+        if self.precisionWeight > 0:
+            # precision is computed by the compiled replay of evaluate, the other evaluators only give the replay fitness
+            if self.racingSchedule is not None:
+                raise ValueError("precisionWeight cannot be combined with racingSchedule")
+            if self.workers > 1:
+                raise ValueError("precisionWeight cannot be combined with workers > 1")
+            if self.replayEngine != "compiled":
+                raise ValueError("precisionWeight needs the compiled replayEngine, not {}".format(self.replayEngine))
+
+    def evaluateNets(self, nets, traces, counts):
+        if len(nets) == 0:
+            return
+        self.replayedNets += len(nets)
+        if self.precisionWeight > 0:
+            if self.continuationTraces is not traces:
+                self.continuations = TraceTrie(traces, counts).continuations()
+                self.continuationTraces = traces
+            self.replayedTraces += len(nets) * len(traces)
+            for petriNet in nets:
+                petriNet.evaluate(traces, counts, continuations=self.continuations)
+                petriNet.fitness = (1 - self.precisionWeight) * petriNet.fitness + self.precisionWeight * petriNet.precision
+            return
+        if self.racingSchedule is not None:
+            if self.racingEvaluator is None or self.racingEvaluator.traces is not traces:
+                self.racingEvaluator = RacingEvaluator(traces, counts, self.racingSchedule, self.racingKeepFraction)
+            replays = self.racingEvaluator.replays
+            self.racingEvaluator.evaluate(nets, max(1, int(self.populationSize * self.elitismRate)))
+            self.replayedTraces += self.racingEvaluator.replays - replays
+            return
+        self.replayedTraces += len(nets) * len(traces)
+        if self.workers > 1:
+            if self.parallelEvaluator is None or self.parallelEvaluator.traces is not traces:
+                self.closeWorkers()
+                encoded = self.encodedVariants(traces)
+                self.parallelEvaluator = ParallelEvaluator(traces, counts, self.workers, self.replayEngine,
+                                                           logCache=None if encoded is None else encoded.path)
+            self.parallelEvaluator.evaluate(nets)
+        elif self.replayEngine == "matrix":
+            if self.matrixReplay is None or self.matrixReplay.traces is not traces:
+                self.matrixReplay = MatrixReplay(traces, counts, encoded=self.encodedVariants(traces))
+            self.matrixReplay.evaluate(nets)
+        elif self.replayEngine == "trie":
+            if self.traceTrie is None or self.traceTrie.traces is not traces:
+                self.traceTrie = TraceTrie(traces, counts)
+            self.traceTrie.evaluate(nets)
+        elif self.replayEngine == "delta":
+            for petriNet in nets:
+                self.skippedEvents += petriNet.evaluateDelta(traces, counts)
+        elif self.replayEngine == "bitmask":
+            for petriNet in nets:
+                petriNet.evaluateBitmask(traces, counts)
+        else:
+            for petriNet in nets:
+                petriNet.evaluate(traces, counts, self.replayEngine == "compiled")
+
+    def closeWorkers(self):
+        if self.parallelEvaluator is not None:
+            self.parallelEvaluator.close()
+            self.parallelEvaluator = None
+
+    def phase(self, name):
+        """
+        Context timing a phase of the generation for the telemetry, does nothing without telemetry.
+        """
+        if self.telemetry is None:
+            return nullcontext()
+        return self.telemetry.phase(name)
+
+    def loadLog(self, csv_datei):
+        """
+        Reads the log and its activities: a CSV with one trace per row in an Activity column,
+        a CSV with one event per row (see logreader.isEventLog) or a XES file.
+        Returns the distinct variants of the log and how often each of them occurs.
+        """
         reader = logreader()
-        traces = reader.readLogs(csv_datei)
+        reader.eventColumns = self.eventColumns
+        self.relations = None
+        if self.useLogCache:
+            self.encodedLog = reader.loadEncoded(csv_datei)
+            self.traces = self.encodedLog.traces()
+            self.allActivities = reader.activities
+            return self.encodedLog.variants(), self.encodedLog.counts.tolist()
+        self.encodedLog = None
+        if reader.isEventLog(csv_datei):
+            # the events are streamed into variants, the traces themselves are never kept
+            variants, counts = reader.readEventLog(csv_datei)
+            self.traces = variants
+            # in order of first appearance in the traces like for the other formats, not in the order the events were read
+            self.allActivities = list(dict.fromkeys(activity for variant in variants for activity in variant))
+            return variants, counts
+        self.traces = reader.readLogs(csv_datei)
         self.allActivities = reader.getAllActivities()
-        print(traces)
-        #print(self.allActivities)
-        # listOfTransitions = ["A", "B", "C", "D", "E", "F", "G", "H"]
-
-        amountOfPlaces = random.randint(round(len(self.allActivities)/2), (len(self.allActivities)) * 2)
-        listOfPlaces = self.createPlaces(amountOfPlaces)
-        transitions = self.createTransitions(self.allActivities, listOfPlaces)
-
-        self.initializeStartingPopulation()
-
-        start_time = time.perf_counter()
-        # run tokenreplay of all traces for every net
-        #for generation in range(self.generations):
-        while self.bestFitness < 0.9:
-            self.doneGenerations += 1
-            for net in self.listOfPetrinets:
-                net.resetAll()
-            for petriNet in self.listOfPetrinets:
-                for trace in traces:
-                    petriNet.resetTokens()
-                    petriNet.run(trace)
-                petriNet.calculateFitness()
-
-            self.listOfPetrinets.sort(key=lambda x: x.fitness, reverse=True)
+        # every distinct trace is replayed once and weighted by how often it occurs
+        return reader.getVariants()
+
+    def encodedVariants(self, traces):
+        """
+        The EncodedLog whose variants are traces, None if the traces did not come from the log cache.
+        """
+        if self.encodedLog is not None and traces is self.encodedLog.variantList:
+            return self.encodedLog
+        return None
+
+    def runGeneration(self, variants, counts):
+        """
+        One generation: evaluation, selection, crossover, mutation and replacement.
+        Leaves the elites, best first, at the front of the next population.
+        """
+        self.doneGenerations += 1
+        if self.telemetry is not None:
+            self.telemetry.beginGeneration(self)
+        with self.phase("evaluation"):
+            self.evaluatePopulation(variants, counts)
+
+        with self.phase("sorting"):
+            # nets dropped by racing only have an estimated fitness and rank behind the fully evaluated ones
+            self.listOfPetrinets.sort(key=lambda x: (not x.estimated, x.fitness), reverse=True)
             if self.bestFitness < self.listOfPetrinets[0].fitness:
                 self.bestFitness = self.listOfPetrinets[0].fitness
+                self.lastImprovement = self.doneGenerations
             bestIndividuals = self.listOfPetrinets[:int(self.populationSize * self.elitismRate)]
+            # only parents of the next offspring need their checkpoints
+            for net in self.listOfPetrinets[len(bestIndividuals):]:
+                net.checkpoints = None
+                net.checkpointTraces = None
+            # children are evaluated, links to their parents would keep discarded nets alive
+            for net in self.listOfPetrinets:
+                net.parents = ()
+        if self.telemetry is not None:
+            self.telemetry.observePopulation(self.listOfPetrinets)
+        if self.adaptiveRates:
+            self.adaptRates()
+        survivors = self.selectSurvivors(bestIndividuals)
+        with self.phase("crossover"):
             offspring = self.doCrossOver(bestIndividuals)
 
+        with self.phase("mutation"):
             for i in range(0, int(len(offspring) * self.mutateRate)):
                 n = random.randint(0, len(offspring) - 1)
                 offspring[n].mutate()
-            print("Current Fitness: ", self.bestFitness, " Generation: ", self.doneGenerations)
-            # self.listOfPetrinets.clear()
-            # self.listOfPetrinets.extend(bestIndividuals)
-            # # self.listOfPetrinets.extend(offspring)
-            # self.initializeNextPopulation(len(bestIndividuals), 0)
+        with self.phase("refill"):
+            self.listOfPetrinets = survivors + offspring
+            if self.replacement == "generational":
+                self.initializeNextPopulation(len(survivors), len(offspring))
+            self.limitPopulationMemory(len(bestIndividuals))
+        if self.verbose:
+            with self.phase("report"):
+                print("Current Fitness: ", self.bestFitness, " Generation: ", self.doneGenerations)
+        if self.telemetry is not None:
+            self.telemetry.endGeneration(self)
+
+    def adaptRates(self):
+        """
+        Raises mutateRate and crossOverRate by adaptFactor for every adaptAfter generations without
+        improvement, so a stagnating search explores more, and resets them after an improvement.
+        Offspring never outnumber the places left next to the elites.
+        """
+        if self.baseRates is None:
+            self.baseRates = (self.mutateRate, self.crossOverRate)
+        stagnation = self.doneGenerations - self.lastImprovement
+        if stagnation == 0:
+            self.mutateRate, self.crossOverRate = self.baseRates
+        elif stagnation % self.adaptAfter == 0:
+            self.mutateRate = min(1.0, self.mutateRate * self.adaptFactor)
+            self.crossOverRate = min(1.0 - self.elitismRate, self.crossOverRate * self.adaptFactor)
+
+    def shouldStop(self):
+        """
+        Returns why the run should stop ("target", "generations", "time" or "stagnation"), None to go on.
+        """
+        if self.startTime is None:
+            self.startTime = time.perf_counter()
+        if self.bestFitness >= self.targetFitness:
+            return "target"
+        if self.generations is not None and self.doneGenerations >= self.generations:
+            return "generations"
+        if self.timeBudget is not None and time.perf_counter() - self.startTime >= self.timeBudget:
+            return "time"
+        if self.stagnationLimit is not None and self.doneGenerations - self.lastImprovement >= self.stagnationLimit:
+            return "stagnation"
+        return None
+
+    def selectSurvivors(self, bestIndividuals):
+        """
+        Nets of the sorted population kept for the next generation, the others are recycled.
+        Generational replacement keeps the elites, steady-state replacement all but the worst
+        nets, which make room for the offspring.
+        """
+        if self.replacement == "generational":
+            keep = len(bestIndividuals)
+        elif self.replacement == "steady-state":
+            offspring = int(self.populationSize * self.crossOverRate)
+            keep = max(len(bestIndividuals), len(self.listOfPetrinets) - offspring)
+        else:
+            raise ValueError("unknown replacement {}".format(self.replacement))
+        self.recycle(self.listOfPetrinets[keep:])
+        return self.listOfPetrinets[:keep]
+
+    def recycle(self, nets):
+        for net in nets:
+            if len(self.recycledNets) >= self.populationSize:
+                break
+            net.dropObjects()
+            self.recycledNets.append(net)
+
+    def populationBytes(self):
+        return sum(net.genome.nbytes() for net in self.listOfPetrinets)
+
+    def limitPopulationMemory(self, keep):
+        """
+        Drops nets from the end of the population until its genomes fit into populationMemoryLimit,
+        the first keep nets always stay.
+        """
+        if self.populationMemoryLimit is None:
+            return
+        total = self.populationBytes()
+        while total > self.populationMemoryLimit and len(self.listOfPetrinets) > keep:
+            net = self.listOfPetrinets.pop()
+            total -= net.genome.nbytes()
+            self.recycle([net])
+
+    def receiveMigrants(self, migrants):
+        """
+        Replaces the worst nets of the (sorted) population with nets from another population.
+        :migrants: Genomes of the nets, packed with Genome.pack.
+        """
+        if len(migrants) == 0:
+            return
+        nets = [PetriNet(genome=Genome.unpack(self.allActivities, data)) for data in migrants[:len(self.listOfPetrinets)]]
+        self.listOfPetrinets[len(self.listOfPetrinets) - len(nets):] = nets
+
+    def saveCheckpoint(self, path):
+        """
+        Saves the population, the state of the random generator and the progress of the run, so
+        loadCheckpoint can continue exactly where it stopped. Genomes are stored packed (see Genome.pack),
+        the file is written next to path and then replaces it, a crash never leaves half a checkpoint.
+        """
+        state = {
+            "version": 1,
+            "activities": list(self.allActivities),
+            "genomes": [net.genome.pack() for net in self.listOfPetrinets],
+            "random": random.getstate(),
+            "doneGenerations": self.doneGenerations,
+            "bestFitness": self.bestFitness,
+            "lastImprovement": self.lastImprovement,
+            "baseRates": self.baseRates,
+            "settings": {"generations": self.generations, "populationSize": self.populationSize, "mutateRate": self.mutateRate,
+                         "elitismRate": self.elitismRate, "crossOverRate": self.crossOverRate},
+        }
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        self.lastCheckpoint = time.perf_counter()
+
+    def loadCheckpoint(self, path):
+        """
+        Restores a state saved by saveCheckpoint. The log has to be loaded already (see loadLog),
+        its activities have to be the ones of the checkpoint.
+        """
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state["activities"] != list(self.allActivities):
+            raise ValueError("checkpoint {} was saved for a log with other activities".format(path))
+        for name, value in state["settings"].items():
+            setattr(self, name, value)
+        self.listOfPetrinets = [PetriNet(genome=Genome.unpack(self.allActivities, data)) for data in state["genomes"]]
+        random.setstate(state["random"])
+        self.doneGenerations = state["doneGenerations"]
+        self.bestFitness = state["bestFitness"]
+        self.lastImprovement = state.get("lastImprovement", self.doneGenerations)
+        self.baseRates = state.get("baseRates")
+        self.lastCheckpoint = time.perf_counter()
+
+    def checkpointIfDue(self):
+        if self.checkpointPath is None:
+            return
+        due = self.checkpointGenerations is not None and self.doneGenerations % self.checkpointGenerations == 0
+        if self.checkpointSeconds is not None and time.perf_counter() - self.lastCheckpoint >= self.checkpointSeconds:
+            due = True
+        if due:
+            self.saveCheckpoint(self.checkpointPath)
+
+    def mine(self, path, resume=False, onGeneration=None):
+        """
+        Loads the log (see loadLog) and evolves nets for it, see evolve.
+        Returns why the run stopped, see shouldStop.
+        """
+        variants, counts = self.loadLog(path)
+        return self.evolve(variants, counts, resume, onGeneration)
+
+    def evolve(self, variants, counts, resume=False, onGeneration=None):
+        """
+        Starts a population, or continues the one saved at checkpointPath if resume is set, and runs
+        generations, saving checkpoints when due, until shouldStop gives a reason, which is returned.
+        The worker processes are closed afterwards, also if a generation fails.
+        :onGeneration: Optional function called with the miner after every generation.
+        """
+        if resume:
+            self.loadCheckpoint(self.checkpointPath)
+        else:
+            self.initializeStartingPopulation()
+        try:
+            stopReason = self.shouldStop()
+            while stopReason is None:
+                self.runGeneration(variants, counts)
+                self.checkpointIfDue()
+                stopReason = self.shouldStop()
+                if onGeneration is not None:
+                    onGeneration(self)
+        finally:
+            self.closeWorkers()
+        return stopReason
+
+    def main(self, csv_datei="logs/small_example_net_complete.csv", resume=False):
+        """
+        Mines the given log, see loadLog for the formats.
+        :resume: Continue the run saved at checkpointPath instead of starting a new population.
+        """
+        variants, counts = self.loadLog(csv_datei)
+        print("Traces: ", sum(counts), " variants: ", len(variants), " activities: ", len(self.allActivities))
+        #print(self.allActivities)
+        # listOfTransitions = ["A", "B", "C", "D", "E", "F", "G", "H"]
+
+        amountOfPlaces = random.randint(round(len(self.allActivities)/2), (len(self.allActivities)) * 2)
+        genome = self.createTransitions(self.allActivities, amountOfPlaces)
 
-        self.listOfPetrinets.sort(key=lambda x: x.fitness, reverse=True)    
+        start_time = time.perf_counter()
+        self.startTime = start_time
+        # run tokenreplay of all traces for every net
+        stopReason = self.evolve(variants, counts, resume)
+
+        if self.telemetry is not None:
+            self.telemetry.close()
+        self.listOfPetrinets.sort(key=lambda x: (not x.estimated, x.fitness), reverse=True)    
         #self.listOfPetrinets[0].printPetrinet()
+        # fitness the nets were ranked and stopped by, the replay fitness combined with the precision if weighted
+        score = self.listOfPetrinets[0].fitness
+        precision = self.listOfPetrinets[0].precision
+
+        # the replay engines only keep the fitness, replay the log on the objects of the best net for the report
+        self.listOfPetrinets[0].resetAll()
+        self.listOfPetrinets[0].evaluate(variants, counts, compiled=False)
         
         
         print("Correct: ", self.listOfPetrinets[0].getConsumedAndProducedTokens())
@@ -199,10 +678,19 @@ class geneticMiner():
         print("fitness: ", self.listOfPetrinets[0].fitness)
         print("accuracy: ", self.listOfPetrinets[0].accuracy)
         print("timesRun: ", self.listOfPetrinets[0].timesRun)
+        if self.precisionWeight > 0:
+            print("precision: ", precision)
+            print("score: ", score, " = ", 1 - self.precisionWeight, " * fitness + ", self.precisionWeight, " * precision")
         self.listOfPetrinets[0].createGraph()
         end_time = time.perf_counter()
         print("Time: ", end_time - start_time, " seconds")
-        print("Done Generations: ", self.doneGenerations)
+        print("Done Generations: ", self.doneGenerations, " Stopped by: ", stopReason)
+        if self.fitnessCache is not None:
+            print("Fitness cache: ", self.fitnessCache.stats())
+        if self.racingEvaluator is not None:
+            print("Racing: ", self.racingEvaluator.stats())
+        if self.replayEngine == "delta":
+            print("Skipped events: ", self.skippedEvents)
         # for net in self.listOfPetrinets:
         #     print("{:.2f}".format(net.fitness))
 
@@ -210,7 +698,14 @@ class geneticMiner():
 
 if __name__ == "__main__":    
     miner = geneticMiner()
-    miner.main()
+    if len(sys.argv) > 2:
+        # python genetic_miner.py log.csv run.checkpoint resumes the run if the checkpoint exists
+        miner.checkpointPath = sys.argv[2]
+        miner.main(sys.argv[1], resume=os.path.exists(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        miner.main(sys.argv[1])
+    else:
+        miner.main()
     # ps = [Place(1, "1"), Place(0, "2"), Place(0, "3"), Place(0, "4"), Place(0,"5"), Place(0,"6")]
     # ts = dict(
     # A=Transition("A", [Out(ps[0])], [In(ps[1]), In(ps[2])]), 
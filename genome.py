@@ -0,0 +1,144 @@
+import struct
+from array import array
+
+class Genome():
+    __slots__ = ("activities", "placeCount", "outPlaces", "outOffsets", "inPlaces", "inOffsets")
+
+    def __init__(self, activities, placeCount):
+        """
+        Compact encoding of a petri net, used by the miner instead of the Place/Transition/Arc objects.
+        Transition t is the transition of activities[t]. The places it takes tokens from are
+        outPlaces[outOffsets[t]:outOffsets[t + 1]], the places it puts tokens into are stored the
+        same way in inPlaces/inOffsets. Places are numbered 0 to placeCount - 1, place 0 holds the
+        start token, every arc moves one token. A place may appear more than once per transition.
+        :activities: The activities of the log, usually shared by all genomes of a population.
+        :placeCount: Amount of places of the net.
+        """
+        self.activities = activities
+        self.placeCount = placeCount
+        self.outPlaces = array("H")
+        self.outOffsets = array("I", [0])
+        self.inPlaces = array("H")
+        self.inOffsets = array("I", [0])
+
+    def clear(self, activities, placeCount):
+        """
+        Removes all transitions, so the genome (and its arrays) can be reused for another net.
+        """
+        self.activities = activities
+        self.placeCount = placeCount
+        del self.outPlaces[:]
+        del self.outOffsets[1:]
+        del self.inPlaces[:]
+        del self.inOffsets[1:]
+
+    def appendTransition(self, outPlaces, inPlaces):
+        """
+        Adds the arcs of the next transition, transitions have to be added in the order of activities.
+        """
+        self.outPlaces.extend(outPlaces)
+        self.outOffsets.append(len(self.outPlaces))
+        self.inPlaces.extend(inPlaces)
+        self.inOffsets.append(len(self.inPlaces))
+
+    def getOut(self, t):
+        return self.outPlaces[self.outOffsets[t]:self.outOffsets[t + 1]]
+
+    def getIn(self, t):
+        return self.inPlaces[self.inOffsets[t]:self.inOffsets[t + 1]]
+
+    def addOut(self, t, place):
+        self.outPlaces.insert(self.outOffsets[t + 1], place)
+        for i in range(t + 1, len(self.outOffsets)):
+            self.outOffsets[i] += 1
+
+    def addIn(self, t, place):
+        self.inPlaces.insert(self.inOffsets[t + 1], place)
+        for i in range(t + 1, len(self.inOffsets)):
+            self.inOffsets[i] += 1
+
+    def popOut(self, t):
+        if self.countOut(t) == 0:
+            raise IndexError("pop from transition without outgoing arcs")
+        place = self.outPlaces.pop(self.outOffsets[t + 1] - 1)
+        for i in range(t + 1, len(self.outOffsets)):
+            self.outOffsets[i] -= 1
+        return place
+
+    def popIn(self, t):
+        if self.countIn(t) == 0:
+            raise IndexError("pop from transition without ingoing arcs")
+        place = self.inPlaces.pop(self.inOffsets[t + 1] - 1)
+        for i in range(t + 1, len(self.inOffsets)):
+            self.inOffsets[i] -= 1
+        return place
+
+    def countOut(self, t):
+        return self.outOffsets[t + 1] - self.outOffsets[t]
+
+    def countIn(self, t):
+        return self.inOffsets[t + 1] - self.inOffsets[t]
+
+    def key(self):
+        """
+        Canonical, hashable form of the structure, see PetriNet.genotypeKey.
+        """
+        return tuple(sorted((name, tuple(sorted(self.getOut(t))), tuple(sorted(self.getIn(t))))
+                            for t, name in enumerate(self.activities)))
+
+    def nbytes(self):
+        """
+        Approximate memory used by the arrays of the genome.
+        """
+        return sum(a.buffer_info()[1] * a.itemsize for a in (self.outPlaces, self.outOffsets, self.inPlaces, self.inOffsets))
+
+    def __getstate__(self):
+        return (self.activities, self.placeCount, self.outPlaces, self.outOffsets, self.inPlaces, self.inOffsets)
+
+    def __setstate__(self, state):
+        self.activities, self.placeCount, self.outPlaces, self.outOffsets, self.inPlaces, self.inOffsets = state
+
+    def pack(self):
+        """
+        Serializes the genome without its activities into bytes, e.g. to send it to another process.
+        """
+        header = struct.pack("<4I", self.placeCount, len(self.outOffsets), len(self.outPlaces), len(self.inPlaces))
+        return header + self.outPlaces.tobytes() + self.outOffsets.tobytes() + self.inPlaces.tobytes() + self.inOffsets.tobytes()
+
+    @staticmethod
+    def unpack(activities, data):
+        """
+        Rebuilds a genome from the output of pack.
+        :activities: The activities of the packed genome.
+        """
+        placeCount, offsets, outs, ins = struct.unpack_from("<4I", data)
+        genome = Genome(activities, placeCount)
+        position = struct.calcsize("<4I")
+        for values, length in ((genome.outPlaces, outs), (genome.outOffsets, offsets), (genome.inPlaces, ins), (genome.inOffsets, offsets)):
+            del values[:]
+            end = position + length * values.itemsize
+            values.frombytes(data[position:end])
+            position = end
+        return genome
+
+    @staticmethod
+    def fromTransitions(transitions, places):
+        """
+        Encodes a net given as Transition objects and a list of places. Transitions are matched to
+        the events by their name like in PetriNet.run, not by their key in transitions.
+        Raises a ValueError for what a genome cannot express: several transitions with the same name
+        or arcs moving more than one token.
+        """
+        placeIndex = {id(place): i for i, place in enumerate(places)}
+        activities = [transition.name for transition in transitions.values()]
+        if len(set(activities)) != len(activities):
+            raise ValueError("a genome has one transition per activity, the names {} repeat".format(
+                sorted(set(name for name in activities if activities.count(name) > 1))))
+        for transition in transitions.values():
+            if any(arc.amount != 1 for arc in transition.out_arcs + transition.in_arcs):
+                raise ValueError("transition {} has an arc moving more than one token".format(transition.name))
+        genome = Genome(activities, len(places))
+        for transition in transitions.values():
+            genome.appendTransition([placeIndex[id(outArc.place)] for outArc in transition.out_arcs],
+                                    [placeIndex[id(inArc.place)] for inArc in transition.in_arcs])
+        return genome
@@ -0,0 +1,139 @@
+import random
+import sys
+import time
+from multiprocessing import Pipe, Process
+from genetic_miner import geneticMiner
+from genome import Genome
+from Petrinet import PetriNet
+
+def runIsland(path, settings, seed, migrationInterval, migrants, connection):
+    """
+    Evolves one population in its own process. Every migrationInterval generations the best
+    migrants nets are sent to the coordinator, which answers with nets from another island
+    or tells the island to stop. Nets travel as packed genomes.
+    """
+    random.seed(seed)
+    miner = geneticMiner()
+    miner.verbose = False
+    for name, value in settings.items():
+        setattr(miner, name, value)
+    variants, counts = miner.loadLog(path)
+    miner.initializeStartingPopulation()
+
+    while True:
+        miner.runGeneration(variants, counts)
+        if miner.doneGenerations % migrationInterval != 0:
+            continue
+        emigrants = [net.genome.pack() for net in miner.listOfPetrinets[:migrants]]
+        connection.send((miner.doneGenerations, miner.bestFitness, emigrants))
+        immigrants = connection.recv()
+        if immigrants is None:
+            break
+        miner.receiveMigrants(immigrants)
+
+    miner.closeWorkers()
+    best = miner.listOfPetrinets[0]
+    connection.send((miner.doneGenerations, best.fitness, best.genome.pack(), miner.allActivities))
+    connection.close()
+
+
+class IslandMiner():
+
+    def __init__(self):
+        """
+        Island model of the genetic miner: independent geneticMiner populations in separate
+        processes that pass their best nets around a ring every migrationInterval generations.
+        The coordinator keeps the global best and stops all islands together.
+        """
+        self.islands = 4
+        self.migrationInterval = 5
+        self.migrants = 2
+        self.targetFitness = 0.9
+        self.maxGenerations = 1000 # per island
+        self.timeBudget = None # seconds, checked at every migration
+        self.seed = 0
+        self.settings = {} # attributes set on the geneticMiner of every island, e.g. populationSize
+        self.reportTimeout = None # seconds to wait for the report of an island, None waits as long as it is alive
+        self.pollInterval = 1.0 # seconds between two checks whether a waited for island is still alive
+        self.bestFitness = 0
+        self.bestGenome = None
+        self.doneGenerations = 0
+        self.rounds = 0
+
+    def run(self, path):
+        """
+        Mines the log with all islands and returns the fittest net found.
+        """
+        start = time.perf_counter()
+        connections = []
+        processes = []
+        for i in range(self.islands):
+            parent, child = Pipe()
+            process = Process(target=runIsland, args=(path, self.settings, self.seed + i,
+                                                      self.migrationInterval, self.migrants, child))
+            process.start()
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+
+        stop = False
+        while not stop:
+            reports = [self.receive(i, connections, processes) for i in range(len(connections))]
+            self.rounds += 1
+            self.doneGenerations = max(generations for generations, fitness, emigrants in reports)
+            self.bestFitness = max([self.bestFitness] + [fitness for generations, fitness, emigrants in reports])
+            stop = (self.bestFitness >= self.targetFitness
+                    or self.doneGenerations >= self.maxGenerations
+                    or (self.timeBudget is not None and time.perf_counter() - start >= self.timeBudget))
+            for i, connection in enumerate(connections):
+                # ring: every island gets the emigrants of the island before it
+                connection.send(None if stop else reports[i - 1][2])
+
+        results = [self.receive(i, connections, processes) for i in range(len(connections))]
+        for process in processes:
+            process.join()
+        # the first island wins ties, so the result only depends on the seeds
+        generations, fitness, packed, activities = max(results, key=lambda result: result[1])
+        self.bestFitness = max(self.bestFitness, fitness)
+        self.bestGenome = Genome.unpack(activities, packed)
+        return PetriNet(genome=self.bestGenome)
+
+    def receive(self, i, connections, processes):
+        """
+        Waits for the next message of island i. If the island died or did not report within
+        reportTimeout, all islands are stopped and a RuntimeError is raised instead of waiting forever.
+        """
+        connection = connections[i]
+        process = processes[i]
+        waited = 0
+        while True:
+            if connection.poll(self.pollInterval):
+                try:
+                    return connection.recv()
+                except EOFError:
+                    # the island closed its end of the pipe by dying
+                    process.join()
+                    error = "island {} exited with code {}".format(i, process.exitcode)
+                    break
+            waited += self.pollInterval
+            if not process.is_alive():
+                error = "island {} exited with code {}".format(i, process.exitcode)
+                break
+            if self.reportTimeout is not None and waited >= self.reportTimeout:
+                error = "island {} did not report within {} seconds".format(i, self.reportTimeout)
+                break
+        for other in processes:
+            if other.is_alive():
+                other.terminate()
+            other.join()
+        raise RuntimeError(error)
+
+
+if __name__ == "__main__":
+    islandMiner = IslandMiner()
+    start_time = time.perf_counter()
+    best = islandMiner.run(sys.argv[1] if len(sys.argv) > 1 else "logs/small_example_net_complete.csv")
+    best.printPetrinet()
+    print("fitness: ", islandMiner.bestFitness)
+    print("Time: ", time.perf_counter() - start_time, " seconds")
+    print("Done Generations: ", islandMiner.doneGenerations, " Migrations: ", islandMiner.rounds)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+
+"""
+Binary cache of a parsed log, stored next to the source as <source>.logcache: the activity codes of all
+traces as one flat int32 array with the trace offsets, the same for the distinct variants with their
+counts, and the vocabulary. Loading memory-maps the arrays, nothing is copied or parsed.
+"""
+
+MAGIC = b"PMLOGC01"
+ARRAYS = [("codes", "<i4"), ("offsets", "<i8"), ("variantCodes", "<i4"), ("variantOffsets", "<i8"),
+          ("counts", "<i8"), ("traceVariants", "<i4")]
+
+def fileHash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TraceView():
+
+    def __init__(self, vocabulary, codes, offsets):
+        """
+        Read-only sequence of the traces of an encoded log, every trace is decoded to a list of
+        activity names only when it is accessed.
+        """
+        self.vocabulary = vocabulary
+        self.codes = codes
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("trace index out of range")
+        vocabulary = self.vocabulary
+        return [vocabulary[code] for code in self.codes[self.offsets[i]:self.offsets[i + 1]].tolist()]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class EncodedLog():
+
+    def __init__(self, vocabulary, codes, offsets, variantCodes, variantOffsets, counts, traceVariants):
+        """
+        Integer encoded log. Trace i consists of codes[offsets[i]:offsets[i + 1]], activity code c is
+        vocabulary[c]. Variants are stored the same way in variantCodes/variantOffsets in order of
+        first appearance, counts[v] is how often variant v occurs and traceVariants[i] the variant of trace i.
+        """
+        self.vocabulary = vocabulary
+        self.codes = codes
+        self.offsets = offsets
+        self.variantCodes = variantCodes
+        self.variantOffsets = variantOffsets
+        self.counts = counts
+        self.traceVariants = traceVariants
+        self.path = None # cache file the arrays are mapped from
+        self.variantList = None
+
+    @staticmethod
+    def fromTraces(traces):
+        """
+        Encodes traces given as lists of activity names, codes are given in order of first appearance.
+        """
+        vocabulary = []
+        index = {}
+        variantIndex = {}
+        codes = []
+        offsets = [0]
+        variantCodes = []
+        variantOffsets = [0]
+        counts = []
+        traceVariants = []
+        for trace in traces:
+            encoded = []
+            for name in trace:
+                code = index.get(name)
+                if code is None:
+                    code = index[name] = len(vocabulary)
+                    vocabulary.append(name)
+                encoded.append(code)
+            codes.extend(encoded)
+            offsets.append(len(codes))
+            key = tuple(encoded)
+            v = variantIndex.get(key)
+            if v is None:
+                v = variantIndex[key] = len(counts)
+                variantCodes.extend(encoded)
+                variantOffsets.append(len(variantCodes))
+                counts.append(0)
+            counts[v] += 1
+            traceVariants.append(v)
+        arrays = [np.array(values, dtype=dtype) for values, (name, dtype) in
+                  zip((codes, offsets, variantCodes, variantOffsets, counts, traceVariants), ARRAYS)]
+        return EncodedLog(vocabulary, *arrays)
+
+    def traces(self):
+        return TraceView(self.vocabulary, self.codes, self.offsets)
+
+    def variants(self):
+        """
+        The variants as lists of activity names, decoded once, like logreader.getVariants.
+        """
+        if self.variantList is None:
+            self.variantList = list(TraceView(self.vocabulary, self.variantCodes, self.variantOffsets))
+        return self.variantList
+
+    def variantLengths(self):
+        return np.diff(self.variantOffsets)
+
+    def save(self, path, source, settings=None):
+        """
+        Writes the log to path, together with modification time, size and hash of the source file
+        it was read from and the settings it was parsed with (see isValid). The file is written to a temporary file of its own next to path and then moved
+        over it, so concurrent writers of the same cache never mix their data.
+        """
+        stat = os.stat(source)
+        arrays = [np.ascontiguousarray(getattr(self, name), dtype=dtype) for name, dtype in ARRAYS]
+        header = {"sourceMtime": stat.st_mtime_ns, "sourceSize": stat.st_size, "sourceHash": fileHash(source),
+                  "settings": {} if settings is None else settings, "vocabulary": self.vocabulary, "arrays": []}
+        # the header is written with the offsets of the arrays, which depend on its own length
+        headerBytes = b""
+        while True:
+            position = len(MAGIC) + 8 + len(headerBytes)
+            position += -position % 8
+            header["arrays"] = []
+            for array in arrays:
+                header["arrays"].append([position, len(array)])
+                position += array.nbytes + (-array.nbytes % 8)
+            encoded = json.dumps(header).encode()
+            stable = len(encoded) == len(headerBytes)
+            headerBytes = encoded
+            if stable:
+                break
+        descriptor, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                                 dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(MAGIC + struct.pack("<Q", len(headerBytes)) + headerBytes)
+                for array, (offset, length) in zip(arrays, header["arrays"]):
+                    file.write(b"\0" * (offset - file.tell()))
+                    file.write(array.tobytes())
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    @staticmethod
+    def readHeader(path):
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError("{} is not a log cache".format(path))
+            size = file.read(8)
+            if len(size) != 8:
+                raise ValueError("{} is truncated".format(path))
+            length, = struct.unpack("<Q", size)
+            return json.loads(file.read(length))
+
+    @staticmethod
+    def load(path):
+        """
+        Maps the arrays of a cache file written by save read-only into memory.
+        Raises a ValueError if the file is not a complete cache.
+        """
+        header = EncodedLog.readHeader(path)
+        arrays = []
+        for (name, dtype), (offset, length) in zip(ARRAYS, header["arrays"]):
+            if length == 0:
+                arrays.append(np.zeros(0, dtype=dtype))
+            else:
+                arrays.append(np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(length,)))
+        log = EncodedLog(header["vocabulary"], *arrays)
+        log.path = path
+        return log
+
+    @staticmethod
+    def isValid(path, source, settings=None):
+        """
+        Whether the cache file belongs to the current content of source: same modification time and size,
+        or, when only the modification time changed, the same hash.
+        :settings: JSON serializable settings the log is parsed with, e.g. the columns of an event log,
+                   a cache written with other settings is not valid.
+        """
+        try:
+            header = EncodedLog.readHeader(path)
+        except (OSError, ValueError):
+            return False
+        # compared as read back from JSON, so tuples and lists or int and float keys do not differ
+        if header.get("settings", {}) != json.loads(json.dumps({} if settings is None else settings)):
+            return False
+        stat = os.stat(source)
+        if stat.st_size != header["sourceSize"]:
+            return False
+        return stat.st_mtime_ns == header["sourceMtime"] or fileHash(source) == header["sourceHash"]
@@ -0,0 +1,212 @@
+import argparse
+import collections
+import csv
+import datetime
+import random
+from xml.sax.saxutils import quoteattr
+from arc import In
+from arc import Out
+from Petrinet import PetriNet
+from place import Place
+from transition import Transition
+
+"""
+Synthetic event logs simulated from a reference petri net, for load testing the reader and
+the replay engines with far more traces than the bundled logs, e.g.
+  python logGenerator.py --traces 1000000 --format xes --output big.xes
+"""
+
+
+class LogGenerator():
+
+    def __init__(self, net, seed=0, maxLoops=3, concurrency=1.0, skew=0.0, maxLength=1000):
+        """
+        Simulates a petri net by firing random enabled transitions until none is enabled.
+        :net: The reference net, built from Place/Transition/In/Out, the holdings of its places
+              are the initial marking.
+        :seed: Seed of the simulation.
+        :maxLoops: How often one transition may fire per trace, bounds the depth of loops.
+        :concurrency: Probability that concurrent transitions are interleaved at random, with 0 they
+                      always fire in the order of the net and only real choices create variants.
+        :skew: Exponent of the weights (1 / (position + 1) ** skew) transitions are chosen by, 0 chooses
+               uniformly, higher values make the first variants dominate the log.
+        :maxLength: Traces are cut after this amount of events.
+        """
+        self.rng = random.Random(seed)
+        self.maxLoops = maxLoops
+        self.concurrency = concurrency
+        self.maxLength = maxLength
+        placeIndex = {id(place): i for i, place in enumerate(net.places)}
+        self.initial = [place.holding for place in net.places]
+        self.names = []
+        self.inputs = [] # per transition the places it takes from, with multiplicity
+        self.outputs = []
+        self.inputSets = []
+        self.needs = [] # per transition (place, tokens needed) pairs
+        self.weights = []
+        for position, transition in enumerate(net.transitions.values()):
+            self.names.append(transition.name)
+            self.inputs.append([placeIndex[id(outArc.place)] for outArc in transition.out_arcs])
+            self.outputs.append([placeIndex[id(inArc.place)] for inArc in transition.in_arcs])
+            self.inputSets.append(frozenset(self.inputs[-1]))
+            self.needs.append(tuple(collections.Counter(self.inputs[-1]).items()))
+            self.weights.append(1 / (position + 1) ** skew)
+        # transitions to check again when the holding of a place changed
+        self.consumers = [[] for place in self.initial]
+        for t, places in enumerate(self.inputs):
+            for p in set(places):
+                self.consumers[p].append(t)
+
+    def isEnabled(self, t, marking):
+        for p, tokens in self.needs[t]:
+            if marking[p] < tokens:
+                return False
+        return True
+
+    def choose(self, candidates):
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.rng.random() >= self.concurrency:
+            # no interleaving: only the transitions in conflict with the first one compete
+            first = candidates[0]
+            candidates = [t for t in candidates if t == first or self.inputSets[t] & self.inputSets[first]]
+        return self.rng.choices(candidates, weights=[self.weights[t] for t in candidates])[0]
+
+    def generateTrace(self):
+        marking = list(self.initial)
+        fired = [0] * len(self.names)
+        enabled = set(t for t in range(len(self.names)) if self.isEnabled(t, marking))
+        trace = []
+        while len(trace) < self.maxLength:
+            candidates = sorted(t for t in enabled if fired[t] < self.maxLoops)
+            if not candidates:
+                break
+            t = self.choose(candidates)
+            fired[t] += 1
+            trace.append(self.names[t])
+            changed = set()
+            for p in self.inputs[t]:
+                marking[p] -= 1
+                changed.add(p)
+            for p in self.outputs[t]:
+                marking[p] += 1
+                changed.add(p)
+            for p in changed:
+                for consumer in self.consumers[p]:
+                    if self.isEnabled(consumer, marking):
+                        enabled.add(consumer)
+                    else:
+                        enabled.discard(consumer)
+        return trace
+
+    def generate(self, amount):
+        """
+        Yields amount traces, one at a time.
+        """
+        for i in range(amount):
+            yield self.generateTrace()
+
+
+def writeCsv(path, traces):
+    """
+    Writes the traces in the Activity format of logreader.readLogs, one trace per row.
+    Only works for activities named by a single character.
+    """
+    with open(path, "w", buffering=1 << 20) as file:
+        file.write("Activity\n")
+        for trace in traces:
+            if any(len(name) != 1 for name in trace):
+                raise ValueError("the Activity format needs single character activities, use writeEventCsv")
+            file.write("".join(trace) + "\n")
+
+
+def writeEventCsv(path, traces, start=datetime.datetime(2020, 1, 1)):
+    """
+    Writes the traces with one event per row and the columns case_id, activity and timestamp,
+    as read by logreader.streamCases. Events are one minute apart.
+    """
+    minute = datetime.timedelta(minutes=1)
+    with open(path, "w", newline="", buffering=1 << 20) as file:
+        writer = csv.writer(file)
+        writer.writerow(["case_id", "activity", "timestamp"])
+        for case, trace in enumerate(traces):
+            time = start + case * minute
+            writer.writerows([case, name, (time + i * minute).isoformat()] for i, name in enumerate(trace))
+
+
+def writeXes(path, traces, start=datetime.datetime(2020, 1, 1)):
+    """
+    Writes the traces as XES file, as read by logreader.iterXes. Events are one minute apart.
+    """
+    minute = datetime.timedelta(minutes=1)
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as file:
+        file.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        file.write('<log xes.version="1.0" xmlns="http://www.xes-standard.org/">\n')
+        file.write('\t<extension name="Concept" prefix="concept" uri="http://www.xes-standard.org/concept.xesext" />\n')
+        file.write('\t<extension name="Time" prefix="time" uri="http://www.xes-standard.org/time.xesext" />\n')
+        for case, trace in enumerate(traces):
+            time = start + case * minute
+            lines = ['\t<trace>\n\t\t<string key="concept:name" value="{}" />\n'.format(case)]
+            for i, name in enumerate(trace):
+                lines.append('\t\t<event>\n\t\t\t<string key="concept:name" value={} />\n'
+                             '\t\t\t<date key="time:timestamp" value="{}" />\n\t\t</event>\n'
+                             .format(quoteattr(name), (time + i * minute).isoformat()))
+            lines.append("\t</trace>\n")
+            file.write("".join(lines))
+        file.write("</log>\n")
+
+
+def smallExampleNet():
+    """
+    Reference net of logs/small_example_net_complete.CSV: A, then B or C or D followed by E and F
+    in parallel and G, then H.
+    """
+    ps = [Place(1, 1)] + [Place(0, i) for i in range(2, 9)]
+    ts = dict(
+        A=Transition("A", [Out(ps[0])], [In(ps[1])]),
+        B=Transition("B", [Out(ps[1])], [In(ps[6])]),
+        C=Transition("C", [Out(ps[1])], [In(ps[6])]),
+        D=Transition("D", [Out(ps[1])], [In(ps[2]), In(ps[3])]),
+        E=Transition("E", [Out(ps[2])], [In(ps[4])]),
+        F=Transition("F", [Out(ps[3])], [In(ps[5])]),
+        G=Transition("G", [Out(ps[4]), Out(ps[5])], [In(ps[6])]),
+        H=Transition("H", [Out(ps[6])], [In(ps[7])]),
+    )
+    return PetriNet(ts, ps)
+
+
+def parallelLoopNet():
+    """
+    Net with many behaviours for large logs of mostly distinct traces: A opens four parallel branches,
+    each doing one of two activities (B or C, D or E, F or G, I or J), K joins them and then either
+    ends the case with Z or repeats the branches with R. Every iteration has 384 orderings.
+    """
+    ps = [Place(1, 1)] + [Place(0, i) for i in range(2, 12)]
+    starts = ps[1:5]
+    ends = ps[5:9]
+    ts = dict(A=Transition("A", [Out(ps[0])], [In(place) for place in starts]))
+    for (first, second), before, after in zip(["BC", "DE", "FG", "IJ"], starts, ends):
+        ts[first] = Transition(first, [Out(before)], [In(after)])
+        ts[second] = Transition(second, [Out(before)], [In(after)])
+    ts["K"] = Transition("K", [Out(place) for place in ends], [In(ps[9])])
+    ts["R"] = Transition("R", [Out(ps[9])], [In(place) for place in starts])
+    ts["Z"] = Transition("Z", [Out(ps[9])], [In(ps[10])])
+    return PetriNet(ts, ps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates a reference net into a synthetic log.")
+    parser.add_argument("--net", choices=["small", "parallel-loop"], default="small")
+    parser.add_argument("--traces", type=int, default=100000)
+    parser.add_argument("--format", choices=["csv", "events", "xes"], default="csv")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-loops", type=int, default=3)
+    parser.add_argument("--concurrency", type=float, default=1.0)
+    parser.add_argument("--skew", type=float, default=0.0)
+    args = parser.parse_args()
+
+    net = smallExampleNet() if args.net == "small" else parallelLoopNet()
+    generator = LogGenerator(net, args.seed, args.max_loops, args.concurrency, args.skew)
+    writer = {"csv": writeCsv, "events": writeEventCsv, "xes": writeXes}[args.format]
+    writer(args.output, generator.generate(args.traces))
@@ -1,27 +1,262 @@
+import csv
+import gzip
+import xml.etree.ElementTree as ET
 import pandas as pd
+from logCache import EncodedLog
 
 class logreader():
 
     def __init__(self):
 
         self.traces = []
-        self.activities = []
+        self.activities = [] # activity names, the position of a name is its code
+        self.activityCodes = {}
+        self.variants = []
+        self.counts = []
         self.daten = None
+        self.encoded = None
+        self.eventColumns = {} # keyword arguments of streamCases for event logs, e.g. {"caseColumn": "case"}
+        self.activityKey = "concept:name" # event attribute holding the activity in XES files
 
     def readLogs(self, path):
+        if path.lower().endswith((".xes", ".xes.gz")):
+            return self.readXes(path, self.activityKey)
+        if self.isEventLog(path):
+            self.traces.extend(self.iterTraces(path))
+            return self.traces
         self.daten = pd.read_csv(path)
-        
-        for index, zeile in self.daten.iterrows():
+        if "Activity" not in self.daten.columns:
+            columns = self.eventLogColumns(path)
+            raise ValueError("{} has neither an Activity column nor the event log columns {} and {}".format(
+                path, columns.get("caseColumn", "case_id"), columns.get("activityColumn", "activity")))
+
+        for activities in self.daten["Activity"]:
             trace = []
-            for char in zeile["Activity"]:
+            for char in activities:
                 trace.append(char)
-            self.traces.append(list(trace)) 
+            self.traces.append(trace)
         return self.traces
 
-    def getAllActivities(self):    
-        for index, zeile in self.daten.iterrows():
-            for char in zeile["Activity"]:
-                if char not in self.activities:
-                    self.activities.append(char) 
-        return self.activities
+    def loadEncoded(self, path, cachePath=None):
+        """
+        Reads the log as EncodedLog from its binary cache (see logCache.py), the log is only parsed
+        with readLogs if the cache is missing or belongs to another version of the file, and the
+        cache is written then. If the cache cannot be written the parsed log is returned.
+        A cache parsed with other eventColumns or another activityKey is outdated as well.
+        :cachePath: Location of the cache, <path>.logcache by default.
+        """
+        if cachePath is None:
+            cachePath = path + ".logcache"
+        settings = self.parseSettings()
+        self.encoded = None
+        if EncodedLog.isValid(cachePath, path, settings):
+            try:
+                self.encoded = EncodedLog.load(cachePath)
+            except ValueError:
+                # a truncated cache is rebuilt like an outdated one
+                pass
+        if self.encoded is None:
+            self.encoded = EncodedLog.fromTraces(self.iterTraces(path))
+            try:
+                self.encoded.save(cachePath, path, settings)
+                self.encoded = EncodedLog.load(cachePath)
+            except (OSError, ValueError):
+                pass
+        self.activities = list(self.encoded.vocabulary)
+        self.activityCodes = {activity: code for code, activity in enumerate(self.activities)}
+        return self.encoded
+
+    def parseSettings(self):
+        """
+        The settings the traces read from a file depend on, besides its content.
+        """
+        return {"eventColumns": dict(self.eventColumns), "activityKey": self.activityKey}
+
+    def isEventLog(self, path):
+        """
+        Whether path is a CSV with one event per row, having the case and activity columns of eventColumns,
+        instead of one trace per row in an Activity column.
+        """
+        if path.lower().endswith((".xes", ".xes.gz")):
+            return False
+        columns = self.eventLogColumns(path)
+        header = set(pd.read_csv(path, sep=columns["sep"], nrows=0).columns)
+        return {columns.get("caseColumn", "case_id"), columns.get("activityColumn", "activity")} <= header
+
+    def eventLogColumns(self, path):
+        """
+        The keyword arguments of streamCases for the file: eventColumns, with the separator detected
+        from the header line if eventColumns does not give one.
+        """
+        columns = dict(self.eventColumns)
+        if "sep" not in columns:
+            with open(path, newline="") as file:
+                header = file.readline()
+            try:
+                columns["sep"] = csv.Sniffer().sniff(header, delimiters=",;\t|").delimiter
+            except csv.Error:
+                # e.g. a single column
+                columns["sep"] = ","
+        return columns
+
+    def iterTraces(self, path):
+        """
+        Yields the traces of any supported log as lists of activity names. XES files and event logs are
+        streamed, so the traces can be encoded without keeping all of them in memory.
+        """
+        if path.lower().endswith((".xes", ".xes.gz")):
+            yield from self.iterXes(path, self.activityKey)
+        elif self.isEventLog(path):
+            for case, trace in self.streamCases(path, **self.eventLogColumns(path)):
+                yield self.decode(trace)
+        else:
+            yield from self.readLogs(path)
+
+    def readXes(self, path, activityKey="concept:name"):
+        """
+        Reads the traces of a XES file, giving the same structure as readLogs for the CSV logs.
+        """
+        for trace in self.iterXes(path, activityKey):
+            self.traces.append(trace)
+        return self.traces
+
+    def iterXes(self, path, activityKey="concept:name"):
+        """
+        Parses a XES (or gzipped XES) file incrementally and yields every trace as a list of activity names
+        as soon as it is complete. Processed elements are cleared, so memory does not grow with the file.
+        :activityKey: Key of the event attribute holding the activity.
+        """
+        opener = gzip.open if path.lower().endswith(".gz") else open
+        with opener(path, "rb") as file:
+            root = None
+            trace = None
+            for event, elem in ET.iterparse(file, events=("start", "end")):
+                tag = elem.tag.rsplit("}", 1)[-1]
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    elif tag == "trace":
+                        trace = []
+                    continue
+                if tag == "event" and trace is not None:
+                    for attribute in elem:
+                        if attribute.get("key") == activityKey:
+                            trace.append(self.activities[self.intern(attribute.get("value"))])
+                            break
+                    elem.clear()
+                elif tag == "trace":
+                    yield trace
+                    trace = None
+                    root.clear()
+
+    def intern(self, activity):
+        """
+        Returns the integer code of an activity name, new names get the next free code.
+        """
+        code = self.activityCodes.get(activity)
+        if code is None:
+            code = len(self.activities)
+            self.activityCodes[activity] = code
+            self.activities.append(activity)
+        return code
 
+    def decode(self, codes):
+        return [self.activities[code] for code in codes]
+
+    def streamCases(self, path, caseColumn="case_id", activityColumn="activity", timestampColumn="timestamp",
+                    chunksize=100000, groupedByCase=False, idleTimeout=None, sep=","):
+        """
+        Streams an event log with one event per row in chunks and yields (case id, trace) for every case,
+        the trace being the activity codes (see intern) of the case in timestamp order.
+        Only the events of open cases are kept in memory. A case is closed when the file ends or
+        :groupedByCase: is set and the next row belongs to another case, or when
+        :idleTimeout: passed between its last event and the latest event read so far (in seconds, or in
+        rows when there is no timestamp column). Closed cases are forgotten, so events of a case after
+        it was closed by the timeout start a new trace with the same case id, the timeout has to be
+        longer than the longest pause within a case.
+        :timestampColumn: Column to order the events of a case by, None keeps the order of the rows.
+        """
+        openCases = {} # case id -> [last timestamp, [(timestamp, row, code), ...]]
+        row = 0
+        currentCase = None
+        latest = None
+        epoch = pd.Timestamp(0, tz="UTC")
+        columns = [caseColumn, activityColumn] if timestampColumn is None else [caseColumn, activityColumn, timestampColumn]
+
+        for chunk in pd.read_csv(path, sep=sep, usecols=columns, chunksize=chunksize):
+            cases = chunk[caseColumn].tolist()
+            activities = chunk[activityColumn].tolist()
+            if timestampColumn is None:
+                timestamps = range(row, row + len(chunk))
+            else:
+                # seconds since the epoch, so the order does not depend on time zones
+                timestamps = ((pd.to_datetime(chunk[timestampColumn], utc=True) - epoch) / pd.Timedelta(seconds=1)).tolist()
+
+            for case, activity, timestamp in zip(cases, activities, timestamps):
+                if groupedByCase and case != currentCase and currentCase in openCases:
+                    yield currentCase, self.closeCase(openCases.pop(currentCase))
+                currentCase = case
+                events = openCases.get(case)
+                if events is None:
+                    events = openCases[case] = [timestamp, []]
+                events[0] = timestamp
+                if latest is None or timestamp > latest:
+                    latest = timestamp
+                events[1].append((timestamp, row, self.intern(activity)))
+                row += 1
+
+            if idleTimeout is not None:
+                for case in [case for case, events in openCases.items() if latest - events[0] > idleTimeout]:
+                    yield case, self.closeCase(openCases.pop(case))
+
+        for case, events in openCases.items():
+            yield case, self.closeCase(events)
+
+    def closeCase(self, events):
+        events[1].sort()
+        return [code for timestamp, row, code in events[1]]
+
+    def readEventLog(self, path, **columns):
+        """
+        Reads an event log with one event per row through streamCases and compresses it into variants
+        on the fly, so memory grows with the open cases and distinct variants, not the file size.
+        Takes the same keyword arguments as streamCases, eventLogColumns if none are given.
+        Returns the variants as lists of activity names and how often each of them occurs.
+        """
+        index = {}
+        variants = []
+        self.counts = []
+        for case, trace in self.streamCases(path, **(columns or self.eventLogColumns(path))):
+            key = tuple(trace)
+            if key in index:
+                self.counts[index[key]] += 1
+            else:
+                index[key] = len(variants)
+                variants.append(key)
+                self.counts.append(1)
+        self.variants = [self.decode(variant) for variant in variants]
+        return self.variants, self.counts
+
+    def getVariants(self):
+        """
+        Compresses the read traces into their distinct variants.
+        Returns the variants in order of first appearance and how often each of them occurs.
+        """
+        self.variants = []
+        self.counts = []
+        index = {}
+        for trace in self.traces:
+            key = tuple(trace)
+            if key in index:
+                self.counts[index[key]] += 1
+            else:
+                index[key] = len(self.variants)
+                self.variants.append(trace)
+                self.counts.append(1)
+        return self.variants, self.counts
+
+    def getAllActivities(self):
+        for trace in self.traces:
+            for char in trace:
+                self.intern(char)
+        return self.activities
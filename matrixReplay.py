@@ -0,0 +1,120 @@
+import numpy as np
+
+class MatrixReplay():
+
+    def __init__(self, traces, counts=None, traceChunk=256, encoded=None):
+        """
+        Token replay engine working on pre/post incidence matrices built from the genomes
+        instead of the Transition/Arc/Place objects. All traces are replayed against all nets of a
+        population at once, giving the same counts as PetriNet.run.
+        :traces: The traces of the log, every trace is a list of activity names.
+        :counts: Optional frequency of every trace (see logreader.getVariants), defaults to 1 each.
+        :traceChunk: Amount of traces replayed at once, bounds the size of the marking array.
+        :encoded: Optional EncodedLog whose variants are the traces, its code arrays are used directly.
+        """
+        self.traces = traces
+        self.counts = [1] * len(traces) if counts is None else list(counts)
+        self.traceChunk = traceChunk
+        self.encoded = encoded
+        if encoded is not None:
+            self.activities = list(encoded.vocabulary)
+            self.activityIndex = {name: code for code, name in enumerate(self.activities)}
+            self.lengths = encoded.variantLengths().astype(np.int64)
+        else:
+            self.activities = []
+            self.activityIndex = {}
+            for trace in traces:
+                for name in trace:
+                    if name not in self.activityIndex:
+                        self.activityIndex[name] = len(self.activities)
+                        self.activities.append(name)
+            self.lengths = np.array([len(trace) for trace in traces], dtype=np.int64)
+        # the last row of every matrix stays empty, it is used to pad shorter traces
+        self.padding = len(self.activities)
+        self.order = np.argsort(self.lengths, kind="stable")
+        self.consumed = None
+        self.produced = None
+        self.remaining = None
+
+    def buildMatrices(self, nets):
+        """
+        Turns every net into its pre (consumed) and post (produced) incidence matrix.
+        Rows are activities of the log, columns are the places of the net padded to
+        the biggest net of the population.
+        """
+        amountOfPlaces = max(net.genome.placeCount for net in nets)
+        shape = (len(nets), self.padding + 1, amountOfPlaces)
+        pre = np.zeros(shape, dtype=np.int64)
+        post = np.zeros(shape, dtype=np.int64)
+        consumedPerFiring = np.zeros(shape[:2], dtype=np.int64)
+        producedPerFiring = np.zeros(shape[:2], dtype=np.int64)
+        initial = np.zeros((len(nets), amountOfPlaces), dtype=np.int64)
+
+        for n, net in enumerate(nets):
+            genome = net.genome
+            for t, name in enumerate(genome.activities):
+                a = self.activityIndex.get(name)
+                if a is None:
+                    continue
+                for p in genome.getOut(t):
+                    pre[n, a, p] += 1
+                for p in genome.getIn(t):
+                    post[n, a, p] += 1
+                consumedPerFiring[n, a] += genome.countOut(t)
+                producedPerFiring[n, a] += genome.countIn(t)
+            # the marking PetriNet.initialMarking starts from
+            initial[n, 0] = 1
+        return pre, post, consumedPerFiring, producedPerFiring, initial
+
+    def encodeTraces(self, indices):
+        codes = np.full((len(indices), int(self.lengths[indices].max(initial=0))), self.padding, dtype=np.int64)
+        if self.encoded is not None:
+            offsets = self.encoded.variantOffsets
+            for row, j in enumerate(indices):
+                codes[row, :self.lengths[j]] = self.encoded.variantCodes[offsets[j]:offsets[j + 1]]
+            return codes
+        for row, j in enumerate(indices):
+            codes[row, :self.lengths[j]] = [self.activityIndex[name] for name in self.traces[j]]
+        return codes
+
+    def evaluate(self, nets):
+        """
+        Replays every trace on every net and stores accuracy, timesRun and fitness
+        on the nets, like calling resetTokens/run for all traces and calculateFitness.
+        """
+        pre, post, consumedPerFiring, producedPerFiring, initial = self.buildMatrices(nets)
+        delta = post - pre
+        amountOfTraces = len(self.traces)
+        self.consumed = np.zeros((len(nets), amountOfTraces), dtype=np.int64)
+        self.produced = np.zeros((len(nets), amountOfTraces), dtype=np.int64)
+        self.remaining = np.zeros((len(nets), amountOfTraces), dtype=np.int64)
+
+        for start in range(0, amountOfTraces, self.traceChunk):
+            indices = self.order[start:start + self.traceChunk]
+            codes = self.encodeTraces(indices)
+            marking = np.repeat(initial[:, None, :], len(indices), axis=1)
+            consumed = np.zeros((len(nets), len(indices)), dtype=np.int64)
+            produced = np.zeros((len(nets), len(indices)), dtype=np.int64)
+            for k in range(codes.shape[1]):
+                a = codes[:, k]
+                marking += delta[:, a, :]
+                consumed += consumedPerFiring[:, a]
+                produced += producedPerFiring[:, a]
+            self.consumed[:, indices] = consumed
+            self.produced[:, indices] = produced
+            self.remaining[:, indices] = np.abs(marking).sum(axis=2)
+
+        correct = self.consumed + self.produced
+        # -1 because in a perfect run one token remains in the last place
+        difference = np.where(self.remaining == 0, 0, self.remaining - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            results = np.where(correct != 0, (correct - difference) / correct, 0.0)
+
+        # summed trace by trace to get the exact same floats as calcualteAccuracy
+        accuracy = np.array([net.accuracy for net in nets], dtype=np.float64)
+        for j in range(amountOfTraces):
+            accuracy += results[:, j] * self.counts[j]
+        for n, net in enumerate(nets):
+            net.accuracy = float(accuracy[n])
+            net.timesRun += sum(self.counts)
+            net.calculateFitness()
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from genetic_miner import geneticMiner
+
+"""
+Local mining service: jobs are sent as one line of JSON over TCP (or a Unix socket), e.g.
+  {"log": "logs/small_example_net_complete.CSV", "settings": {"populationSize": 100}, "seed": 0}
+and answered with one line of JSON per generation ({"type": "progress", ...}) followed by
+{"type": "result", ...} or {"type": "error", ...}. Start it with
+  python miningServer.py --port 8765 --workers 4
+"""
+
+# set once per worker process by initWorker
+workerProgress = None
+workerLogs = {} # (path, parse settings) -> (modification time, size, traces, activities, variants, counts, encoded log)
+
+def initWorker(progress):
+    global workerProgress
+    workerProgress = progress
+
+def warmUp():
+    return os.getpid()
+
+def loadLogCached(miner, path):
+    """
+    Loads the log into the miner, parsing it only if the worker has not read this version of the file
+    with the same settings of the miner before.
+    Returns variants, counts and whether the log came from the cache.
+    """
+    stat = os.stat(path)
+    key = (path, miner.useLogCache, json.dumps(miner.eventColumns, sort_keys=True))
+    cached = workerLogs.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        miner.traces, miner.allActivities, variants, counts, miner.encodedLog = cached[2:]
+        miner.relations = None
+        return variants, counts, True
+    variants, counts = miner.loadLog(path)
+    workerLogs[key] = (stat.st_mtime_ns, stat.st_size, miner.traces, miner.allActivities, variants, counts, miner.encodedLog)
+    return variants, counts, False
+
+def runJob(jobId, path, settings, seed, targetFitness, maxGenerations, timeBudget):
+    """
+    Mines one log in a worker process, reporting every generation to the progress queue.
+    """
+    start = time.perf_counter()
+    random.seed(seed)
+    miner = geneticMiner()
+    miner.verbose = False
+    miner.targetFitness = targetFitness
+    miner.generations = maxGenerations
+    miner.timeBudget = timeBudget
+    for name, value in settings.items():
+        setattr(miner, name, value)
+    miner.startTime = start
+    def report(miner):
+        workerProgress.put((jobId, {"type": "progress", "generation": miner.doneGenerations,
+                                    "bestFitness": miner.bestFitness, "seconds": time.perf_counter() - start}))
+    try:
+        variants, counts, cached = loadLogCached(miner, path)
+        stopReason = miner.evolve(variants, counts, onGeneration=report)
+    finally:
+        workerProgress.put((jobId, None))
+
+    best = miner.listOfPetrinets[0]
+    genome = best.genome
+    return {"type": "result", "fitness": best.fitness, "bestFitness": miner.bestFitness,
+            "generations": miner.doneGenerations, "seconds": time.perf_counter() - start, "logCached": cached,
+            "stopReason": stopReason,
+            "placeCount": genome.placeCount,
+            "transitions": {name: {"out": list(genome.getOut(t)), "in": list(genome.getIn(t))}
+                            for t, name in enumerate(genome.activities)}}
+
+
+class MiningServer():
+
+    def __init__(self, workers=2, host="127.0.0.1", port=0, unixPath=None):
+        """
+        Runs mining jobs on a pool of worker processes that stay alive between jobs, so
+        imports and parsed logs are reused. Jobs beyond the amount of workers wait in the pool.
+        :port: TCP port, 0 picks a free one (see self.port after start).
+        :unixPath: Listen on this Unix socket instead of TCP.
+        """
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.unixPath = unixPath
+        self.pool = None
+        self.progress = None
+        self.progressThread = None
+        self.server = None
+        self.loop = None
+        self.listeners = {} # job id -> asyncio.Queue of its progress messages
+        self.nextJobId = 0
+        self.doneJobs = 0
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context()
+        self.progress = context.Queue()
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=initWorker, initargs=(self.progress,))
+        # start all worker processes now instead of with the first jobs
+        await asyncio.gather(*[self.loop.run_in_executor(self.pool, warmUp) for i in range(self.workers)])
+        self.progressThread = threading.Thread(target=self.forwardProgress, daemon=True)
+        self.progressThread.start()
+        if self.unixPath is not None:
+            self.server = await asyncio.start_unix_server(self.handle, self.unixPath)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    def forwardProgress(self):
+        while True:
+            message = self.progress.get()
+            if message is None:
+                return
+            self.loop.call_soon_threadsafe(self.dispatch, *message)
+
+    def dispatch(self, jobId, message):
+        listener = self.listeners.get(jobId)
+        if listener is not None:
+            listener.put_nowait(message)
+
+    def parseJob(self, line):
+        request = json.loads(line)
+        if not isinstance(request, dict) or "log" not in request:
+            raise ValueError("a job needs the path of a log")
+        if not os.path.exists(request["log"]):
+            raise ValueError("log {} does not exist".format(request["log"]))
+        settings = request.get("settings", {})
+        probe = geneticMiner()
+        for name in settings:
+            if name.startswith("_") or not hasattr(probe, name) or callable(getattr(probe, name)):
+                raise ValueError("unknown setting {}".format(name))
+        return (os.path.abspath(request["log"]), settings, request.get("seed", 0), request.get("targetFitness", 0.9),
+                request.get("maxGenerations", probe.generations), request.get("timeBudget"))
+
+    async def send(self, writer, message):
+        writer.write((json.dumps(message) + "\n").encode())
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        jobId = None
+        try:
+            try:
+                job = self.parseJob(await reader.readline())
+            except ValueError as error:
+                await self.send(writer, {"type": "error", "message": str(error)})
+                return
+            jobId = self.nextJobId
+            self.nextJobId += 1
+            listener = self.listeners[jobId] = asyncio.Queue()
+            future = self.loop.run_in_executor(self.pool, runJob, jobId, *job)
+            # progress until the worker reports the end of the job, the result follows on the future
+            while True:
+                get = asyncio.ensure_future(listener.get())
+                await asyncio.wait({get, future}, return_when=asyncio.FIRST_COMPLETED)
+                if get.done():
+                    message = get.result()
+                elif future.exception() is not None:
+                    # e.g. a crashed worker, which never reports the end of the job
+                    get.cancel()
+                    break
+                else:
+                    message = await get
+                if message is None:
+                    break
+                await self.send(writer, message)
+            try:
+                result = await future
+            except Exception as error:
+                result = {"type": "error", "message": repr(error)}
+            self.doneJobs += 1
+            await self.send(writer, result)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.listeners.pop(jobId, None)
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.progress is not None:
+            self.progress.put(None)
+            self.progressThread.join()
+
+
+async def submitJob(request, host="127.0.0.1", port=8765, unixPath=None, onProgress=None):
+    """
+    Sends a job to a MiningServer and waits for it.
+    :onProgress: Called with every progress message.
+    Returns the result (or error) message.
+    """
+    if unixPath is not None:
+        reader, writer = await asyncio.open_unix_connection(unixPath)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps(request) + "\n").encode())
+    await writer.drain()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("server closed the connection without a result")
+            message = json.loads(line)
+            if message["type"] != "progress":
+                return message
+            if onProgress is not None:
+                onProgress(message)
+    finally:
+        writer.close()
+
+
+async def serve(workers, host, port, unixPath):
+    server = MiningServer(workers, host, port, unixPath)
+    await server.start()
+    print("Listening on ", unixPath if unixPath is not None else "{}:{}".format(server.host, server.port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local server running mining jobs on warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="path of a Unix socket to listen on instead of TCP")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.workers, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+from Petrinet import PetriNet
+from matrixReplay import MatrixReplay
+from prefixTree import TraceTrie
+from logCache import EncodedLog
+
+# log of the worker process, set once by initWorker when the pool starts
+workerTraces = None
+workerCounts = None
+workerMatrixReplay = None
+workerTraceTrie = None
+workerReplayEngine = None
+
+def initWorker(traces, counts, replayEngine, logCache=None):
+    global workerTraces, workerCounts, workerMatrixReplay, workerTraceTrie, workerReplayEngine
+    encoded = None
+    if logCache is not None:
+        # the variants of the cached log, mapped from the file instead of sent to the worker
+        encoded = EncodedLog.load(logCache)
+        traces = encoded.variants()
+        counts = encoded.counts.tolist()
+    workerTraces = traces
+    workerCounts = counts
+    workerReplayEngine = replayEngine
+    if replayEngine == "matrix":
+        workerMatrixReplay = MatrixReplay(traces, counts, encoded=encoded)
+    elif replayEngine == "trie":
+        workerTraceTrie = TraceTrie(traces, counts)
+
+def evaluateBatch(encodedNets):
+    """
+    Replays the log of the worker on a batch of encoded nets.
+    Returns accuracy, timesRun and fitness for every net, in the order of the batch.
+    """
+    nets = [PetriNet.decode(encoded) for encoded in encodedNets]
+    for net in nets:
+        net.resetAll()
+    if workerMatrixReplay is not None:
+        workerMatrixReplay.evaluate(nets)
+    elif workerTraceTrie is not None:
+        workerTraceTrie.evaluate(nets)
+    elif workerReplayEngine == "bitmask":
+        for net in nets:
+            net.evaluateBitmask(workerTraces, workerCounts)
+    else:
+        for net in nets:
+            net.evaluate(workerTraces, workerCounts, workerReplayEngine != "object")
+    return [(net.accuracy, net.timesRun, net.fitness) for net in nets]
+
+
+class ParallelEvaluator():
+
+    def __init__(self, traces, counts, workers, replayEngine="compiled", batchesPerWorker=4, logCache=None):
+        """
+        Evaluates the nets of a population on a pool of worker processes.
+        The log is handed to every worker once when the pool starts, nets are sent encoded.
+        :traces: The traces or variants of the log.
+        :counts: Frequency of every trace.
+        :workers: Amount of worker processes.
+        :replayEngine: Replay engine the workers use, see geneticMiner.replayEngine.
+        :batchesPerWorker: Amount of batches the population is split into per worker.
+        :logCache: Path of the cache file (see logCache.py) whose variants are the traces, the workers
+                   map it themselves instead of receiving the traces.
+        """
+        self.traces = traces
+        self.workers = workers
+        self.batchesPerWorker = batchesPerWorker
+        if logCache is not None:
+            initargs = (None, None, replayEngine, logCache)
+        else:
+            initargs = (traces, counts, replayEngine)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=initargs)
+
+    def evaluate(self, nets):
+        encoded = [net.encode() for net in nets]
+        batchSize = max(1, -(-len(encoded) // (self.workers * self.batchesPerWorker)))
+        batches = [encoded[i:i + batchSize] for i in range(0, len(encoded), batchSize)]
+        # map keeps the order of the batches, so results do not depend on the amount of workers
+        results = [result for batch in self.pool.map(evaluateBatch, batches) for result in batch]
+        for net, (accuracy, timesRun, fitness) in zip(nets, results):
+            net.accuracy = accuracy
+            net.timesRun = timesRun
+            net.fitness = fitness
+
+    def close(self):
+        self.pool.shutdown()
@@ -0,0 +1,87 @@
+class TrieNode():
+    __slots__ = ("children", "ends")
+
+    def __init__(self):
+        self.children = {} # activity name -> TrieNode
+        self.ends = [] # positions of the traces ending in this node
+
+
+class TraceTrie():
+
+    def __init__(self, traces, counts=None):
+        """
+        The traces of a log organized as prefix tree, so replay can share the work of common prefixes.
+        :traces: The traces or variants of the log.
+        :counts: Optional frequency of every trace, defaults to 1 each.
+        """
+        self.traces = traces
+        self.counts = [1] * len(traces) if counts is None else list(counts)
+        self.root = TrieNode()
+        self.nodes = 0 # activities replayed per net, one per node
+        self.events = 0 # activities replayed per net without the tree
+        for i, trace in enumerate(traces):
+            node = self.root
+            for name in trace:
+                child = node.children.get(name)
+                if child is None:
+                    child = node.children[name] = TrieNode()
+                    self.nodes += 1
+                node = child
+            node.ends.append(i)
+            self.events += len(trace)
+
+    def continuations(self):
+        """
+        For every trace and every event of it, the activities that follow the prefix before
+        that event anywhere in the log, as shared tuples. Used for precision, see PetriNet.evaluate.
+        """
+        shared = {}
+        result = []
+        for trace in self.traces:
+            node = self.root
+            observed = []
+            for name in trace:
+                names = shared.get(id(node))
+                if names is None:
+                    names = shared[id(node)] = tuple(node.children)
+                observed.append(names)
+                node = node.children[name]
+            result.append(observed)
+        return result
+
+    def replay(self, net):
+        """
+        Replays the tree depth first on the compiled plan of the net. The marking and the
+        consumed/produced counter are copied at branch points and restored from that copy
+        for the other branches. Returns the accuracy of every trace, in the order of the traces.
+        """
+        if net.plan is None:
+            net.compile()
+        results = [0] * len(self.traces)
+        stack = [(self.root, net.initialMarking(), 0)]
+        while stack:
+            node, marking, correct = stack.pop()
+            while True:
+                for i in node.ends:
+                    results[i] = net.markingAccuracy(marking, correct)
+                if not node.children:
+                    break
+                children = list(node.children.items())
+                # every branch but the first continues on a copy, the first one on the marking itself
+                for name, child in children[1:]:
+                    branchMarking = list(marking)
+                    stack.append((child, branchMarking, net.step(name, branchMarking, correct)))
+                name, node = children[0]
+                correct = net.step(name, marking, correct)
+        return results
+
+    def evaluate(self, nets):
+        """
+        Stores accuracy, timesRun and fitness on the nets, like PetriNet.evaluate.
+        """
+        for net in nets:
+            results = self.replay(net)
+            for result, count in zip(results, self.counts):
+                net.accuracy = net.accuracy + result * count
+                net.timesRun += count
+            net.calculateFitness()
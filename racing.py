@@ -0,0 +1,96 @@
+import math
+import random
+
+class RacingEvaluator():
+
+    def __init__(self, traces, counts, schedule=(0.1, 0.3, 1.0), keepFraction=0.5, seed=0):
+        """
+        Successive halving over trace samples: all nets are scored on a small stratified sample of
+        the log, the worst ones are dropped and the sample grows for the rest. Only the nets left
+        for the last stage get their fitness from the full log.
+        :traces: The traces or variants of the log.
+        :counts: Frequency of every trace, used as weight.
+        :schedule: Share of the traces replayed up to each stage, the last entry should be 1.
+        :keepFraction: Share of the nets kept after every stage but the last one.
+        :seed: Seed of the sample order.
+        """
+        self.traces = traces
+        self.counts = counts
+        self.schedule = schedule
+        self.keepFraction = keepFraction
+        self.order = self.stratifiedOrder(random.Random(seed))
+        self.replays = 0
+        self.baselineReplays = 0
+
+    def stratifiedOrder(self, rng):
+        """
+        Order of the traces in which every prefix is a stratified sample: traces are grouped
+        by their first and last activity, and every group is spread evenly over the order.
+        """
+        strata = {}
+        for i, trace in enumerate(self.traces):
+            key = (trace[0], trace[-1]) if len(trace) > 0 else ()
+            strata.setdefault(key, []).append(i)
+        keyed = []
+        for members in strata.values():
+            rng.shuffle(members)
+            for rank, i in enumerate(members):
+                keyed.append(((rank + 0.5) / len(members), i))
+        keyed.sort()
+        return [i for position, i in keyed]
+
+    def evaluate(self, nets, minSurvivors=1):
+        """
+        Stores accuracy, timesRun and fitness on the nets. Nets dropped before the last stage
+        keep the estimate from their sample and are marked as estimated.
+        :minSurvivors: Amount of nets never dropped, e.g. the amount of best individuals.
+        """
+        results = [{} for net in nets]
+        starts = [(net.accuracy, net.timesRun) for net in nets]
+        survivors = list(range(len(nets)))
+        covered = 0
+        for stage, share in enumerate(self.schedule):
+            last = stage == len(self.schedule) - 1
+            size = len(self.order) if last else max(1, min(len(self.order), math.ceil(share * len(self.order))))
+            sample = self.order[covered:size]
+            for n in survivors:
+                self.replayTraces(nets[n], sample, results[n])
+            self.replays += len(sample) * len(survivors)
+            covered = max(covered, size)
+            if last:
+                break
+            for n in survivors:
+                self.storeFitness(nets[n], results[n], starts[n])
+            survivors.sort(key=lambda n: nets[n].fitness, reverse=True)
+            keep = max(minSurvivors, math.ceil(len(survivors) * self.keepFraction))
+            for n in survivors[keep:]:
+                nets[n].estimated = True
+            survivors = survivors[:keep]
+
+        for n in survivors:
+            self.storeFitness(nets[n], results[n], starts[n])
+        self.baselineReplays += len(self.traces) * len(nets)
+
+    def replayTraces(self, net, sample, results):
+        initial = net.initialMarking()
+        for i in sample:
+            marking = list(initial)
+            fired = net.replayPlan(self.traces[i], marking)
+            results[i] = net.planAccuracy(marking, fired)
+
+    def storeFitness(self, net, results, start):
+        """
+        Fitness from the replayed traces, summed in trace order like PetriNet.evaluate.
+        """
+        accuracy, timesRun = start
+        for i in sorted(results):
+            accuracy = accuracy + results[i] * self.counts[i]
+            timesRun += self.counts[i]
+        net.accuracy = accuracy
+        net.timesRun = timesRun
+        net.calculateFitness()
+
+    def stats(self):
+        saved = self.baselineReplays - self.replays
+        return {"replays": self.replays, "baselineReplays": self.baselineReplays, "saved": saved,
+                "savedShare": saved / self.baselineReplays if self.baselineReplays else 0}
@@ -0,0 +1,185 @@
+import json
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+"""
+Structured per-generation telemetry of the miner, e.g.
+  miner.telemetry = Telemetry([JsonlSink("run.jsonl")], profileGenerations=range(10, 13))
+writes one JSON record per generation and profiles generations 10 to 12.
+"""
+
+
+class JsonlSink():
+
+    def __init__(self, path):
+        """
+        Appends every record as one line of JSON to the file.
+        """
+        self.file = open(path, "a", buffering=1)
+
+    def write(self, record):
+        self.file.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackSink():
+
+    def __init__(self, callback):
+        """
+        Passes every record to callback, e.g. list.append to keep the records in memory.
+        """
+        self.callback = callback
+
+    def write(self, record):
+        self.callback(record)
+
+    def close(self):
+        pass
+
+
+class SamplingProfiler():
+
+    def __init__(self, interval=0.005, threadId=None):
+        """
+        Samples the stack of a thread from a background thread via sys._current_frames,
+        so nothing has to be instrumented and the profiled code runs at almost full speed.
+        :interval: Seconds between two samples.
+        :threadId: Thread to sample, the thread creating the profiler if not given.
+        """
+        self.interval = interval
+        self.threadId = threading.get_ident() if threadId is None else threadId
+        self.samples = 0
+        self.selfCounts = Counter() # function on top of the stack
+        self.totalCounts = Counter() # function anywhere on the stack
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def sample(self):
+        while self.running:
+            frame = sys._current_frames().get(self.threadId)
+            if frame is not None:
+                self.samples += 1
+                self.selfCounts[self.functionName(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    name = self.functionName(frame)
+                    if name not in seen:
+                        seen.add(name)
+                        self.totalCounts[name] += 1
+                    frame = frame.f_back
+            time.sleep(self.interval)
+
+    @staticmethod
+    def functionName(frame):
+        code = frame.f_code
+        return "{}:{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_firstlineno, code.co_name)
+
+    def top(self, amount=20):
+        """
+        The functions with the most samples on top of the stack, with their self and total samples.
+        """
+        return [{"function": name, "self": count, "total": self.totalCounts[name]}
+                for name, count in self.selfCounts.most_common(amount)]
+
+
+class Telemetry():
+
+    def __init__(self, sinks=None, profileGenerations=(), profileInterval=0.005, profileTop=20):
+        """
+        Collects the timings of the phases of every generation, the amount of replays and
+        statistics of the population, and writes them as one record per generation to the sinks.
+        :sinks: Objects with write(record) and close(), e.g. JsonlSink or CallbackSink.
+        :profileGenerations: Generations to run under the SamplingProfiler, its hot spots are added to the record.
+        :profileInterval: Seconds between two samples of the profiler.
+        :profileTop: Amount of functions reported by the profiler.
+        """
+        self.sinks = [] if sinks is None else list(sinks)
+        self.profileGenerations = profileGenerations
+        self.profileInterval = profileInterval
+        self.profileTop = profileTop
+        self.timings = {}
+        self.generationStart = None
+        self.profiler = None
+        self.replays = None
+        self.population = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def beginGeneration(self, miner):
+        self.timings = {}
+        self.replays = (miner.replayedNets, miner.replayedTraces, miner.skippedEvents)
+        if miner.doneGenerations in self.profileGenerations:
+            self.profiler = SamplingProfiler(self.profileInterval)
+            self.profiler.start()
+        self.generationStart = time.perf_counter()
+
+    def observePopulation(self, nets):
+        """
+        Takes the statistics of the evaluated population, before nets are replaced.
+        """
+        fitness = [net.fitness for net in nets]
+        self.population = {
+            "generationBest": max(fitness),
+            "meanFitness": statistics.fmean(fitness),
+            "fitnessStdev": statistics.pstdev(fitness),
+            # share of distinct structures in the population
+            "diversity": len(set(net.genotypeKey() for net in nets)) / len(nets),
+            "populationSize": len(nets),
+        }
+
+    def endGeneration(self, miner):
+        seconds = time.perf_counter() - self.generationStart
+        if self.population is None:
+            self.observePopulation(miner.listOfPetrinets)
+        record = {
+            "generation": miner.doneGenerations,
+            "seconds": seconds,
+            "timings": self.timings,
+            "replayedNets": miner.replayedNets - self.replays[0],
+            "replayedTraces": miner.replayedTraces - self.replays[1],
+            # events the delta engine resumed past instead of replaying them, weighted by the counts
+            "skippedEvents": miner.skippedEvents - self.replays[2],
+            "bestFitness": miner.bestFitness,
+            "populationBytes": miner.populationBytes(),
+        }
+        record.update(self.population)
+        self.population = None
+        if miner.fitnessCache is not None:
+            record["fitnessCache"] = miner.fitnessCache.stats()
+        if self.profiler is not None:
+            self.profiler.stop()
+            record["profile"] = {"samples": self.profiler.samples, "top": self.profiler.top(self.profileTop)}
+            self.profiler = None
+        self.write(record)
+        return record
+
+    def write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,140 @@
+import glob
+import os
+import random
+import pytest
+from genetic_miner import geneticMiner
+from parallelEvaluation import ParallelEvaluator
+from prefixTree import TraceTrie
+
+"""
+Checks that every replay engine gives the fitness of PetriNet.run and that a resumed run
+reproduces an uninterrupted one, via
+  python -m pytest -q
+"""
+
+LOGS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "*.CSV")))
+ENGINES = ["compiled", "matrix", "trie", "bitmask", "delta"]
+
+
+def createMiner(path, seed=0, populationSize=20, **settings):
+    random.seed(seed)
+    miner = geneticMiner()
+    miner.verbose = False
+    miner.useLogCache = False
+    miner.populationSize = populationSize
+    miner.fitnessCacheSize = 0
+    for name, value in settings.items():
+        setattr(miner, name, value)
+    variants, counts = miner.loadLog(path)
+    miner.initializeStartingPopulation()
+    return miner, variants, counts
+
+
+def runFitness(nets, variants, counts):
+    """
+    Fitness of every net replayed with PetriNet.run on its Transition objects.
+    """
+    fitness = []
+    for net in nets:
+        net.resetAll()
+        net.evaluate(variants, counts, compiled=False)
+        fitness.append(net.fitness)
+    return fitness
+
+
+def breedOffspring(miner):
+    """
+    Replaces the evaluated population with mutated offspring of it, which know their parents.
+    """
+    parents = miner.listOfPetrinets
+    offspring = [miner.crossOver(random.choice(parents), random.choice(parents)) for net in parents]
+    for net in offspring[::3]:
+        net.mutate()
+    miner.listOfPetrinets = offspring
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("path", LOGS, ids=os.path.basename)
+def test_engine_matches_run(path, engine):
+    miner, variants, counts = createMiner(path, replayEngine=engine)
+    for generation in range(2):
+        # the second generation are offspring, which the delta engine resumes from their parents
+        miner.evaluatePopulation(variants, counts)
+        fitness = [net.fitness for net in miner.listOfPetrinets]
+        assert fitness == pytest.approx(runFitness(miner.listOfPetrinets, variants, counts), rel=1e-12)
+        breedOffspring(miner)
+    if engine == "delta":
+        assert miner.skippedEvents > 0
+
+
+@pytest.mark.parametrize("path", LOGS, ids=os.path.basename)
+def test_precision_replay_matches_run(path):
+    miner, variants, counts = createMiner(path)
+    continuations = TraceTrie(variants, counts).continuations()
+    for net in miner.listOfPetrinets:
+        net.resetAll()
+        net.evaluate(variants, counts, continuations=continuations)
+    fitness = [net.fitness for net in miner.listOfPetrinets]
+    assert fitness == pytest.approx(runFitness(miner.listOfPetrinets, variants, counts), rel=1e-12)
+
+
+@pytest.mark.parametrize("engine", ["compiled", "matrix", "trie", "bitmask"])
+def test_workers_match_one_process(engine):
+    miner, variants, counts = createMiner(LOGS[0], replayEngine=engine)
+    miner.evaluatePopulation(variants, counts)
+    expected = [net.fitness for net in miner.listOfPetrinets]
+    evaluator = ParallelEvaluator(variants, counts, 2, engine)
+    try:
+        evaluator.evaluate(miner.listOfPetrinets)
+    finally:
+        evaluator.close()
+    assert [net.fitness for net in miner.listOfPetrinets] == expected
+
+
+def test_log_cache_matches_parsed_log(tmp_path):
+    source = LOGS[0]
+    path = str(tmp_path / os.path.basename(source))
+    with open(source, "rb") as file, open(path, "wb") as copy:
+        copy.write(file.read())
+    parsed = geneticMiner()
+    parsed.useLogCache = False
+    expected = parsed.loadLog(path)
+    for attempt in range(2):
+        # the first load writes the cache, the second maps it
+        cached = geneticMiner()
+        assert cached.loadLog(path) == expected
+        assert cached.allActivities == parsed.allActivities
+    assert os.path.exists(path + ".logcache")
+
+
+def test_resume_reproduces_uninterrupted_run(tmp_path):
+    path = next(log for log in LOGS if "big_example" in log)
+    checkpoint = str(tmp_path / "run.checkpoint")
+
+    def createRun(checkpointPath=None):
+        miner = geneticMiner()
+        miner.verbose = False
+        miner.useLogCache = False
+        miner.populationSize = 30
+        miner.generations = 10
+        miner.targetFitness = 2
+        miner.checkpointPath = checkpointPath
+        miner.checkpointGenerations = 5
+        return miner
+
+    random.seed(3)
+    uninterrupted = createRun()
+    uninterrupted.mine(path)
+
+    def crash(miner):
+        if miner.doneGenerations == 7:
+            raise KeyboardInterrupt
+    random.seed(3)
+    with pytest.raises(KeyboardInterrupt):
+        createRun(checkpoint).mine(path, onGeneration=crash)
+    resumed = createRun(checkpoint)
+    resumed.mine(path, resume=True)
+
+    assert resumed.doneGenerations == uninterrupted.doneGenerations == 10
+    assert resumed.bestFitness == uninterrupted.bestFitness
+    assert [net.genome.pack() for net in resumed.listOfPetrinets] == [net.genome.pack() for net in uninterrupted.listOfPetrinets]